@@ -0,0 +1,94 @@
+import pygame
+
+# Shared cache for images
+# Every file is loaded once and scaled once per size, and everyone asking for it gets the same surface.
+# Frames of an animation are packed side by side into one atlas surface and handed out as subsurfaces of it
+class Assets:
+    images = {}
+    scaled_images = {}
+    spritesets = {}
+
+    def load_image(path):
+        if (path not in Assets.images):
+            Assets.images[path] = pygame.image.load(path)
+        return Assets.images[path]
+
+    # size is either the final (width, height) or a scaling factor for the original image
+    def load_scaled_image(path, size):
+        key = (path, size)
+        if (key not in Assets.scaled_images):
+            Assets.scaled_images[key] = Assets.build_scaled_image(path, size)
+        return Assets.scaled_images[key]
+
+    def build_scaled_image(path, size):
+        image = Assets.load_image(path)
+        if (isinstance(size, int)):
+            size = (image.get_width() * size, image.get_height() * size)
+        return pygame.transform.scale(image, size)
+
+    # Returns the frames of an animation as a list of surfaces of the given size
+    # Spritesets are cached by their frame paths, so e.g. all red ghosts looking left share one list
+    def load_spriteset(paths, size):
+        key = (tuple(paths), size)
+        if (key not in Assets.spritesets):
+            Assets.spritesets[key] = Assets.build_spriteset(paths, size)
+        return Assets.spritesets[key]
+
+    def build_spriteset(paths, size):
+        return Assets.pack_into_atlas([pygame.transform.scale(Assets.load_image(path), size) for path in paths])
+
+    # Returns {orientation: frames} where every frame of the spriteset is transformed once, up front,
+    # instead of every time it is drawn. orientations maps any key (e.g. a direction) to
+    # (angle, flip_x, flip_y), the angle being a counterclockwise rotation in degrees applied after flipping
+    def load_oriented_spritesets(paths, size, orientations):
+        key = (tuple(paths), size, tuple(orientations.items()))
+        if (key not in Assets.spritesets):
+            Assets.spritesets[key] = Assets.build_oriented_spritesets(paths, size, orientations)
+        return Assets.spritesets[key]
+
+    def build_oriented_spritesets(paths, size, orientations):
+        frames = Assets.load_spriteset(paths, size)
+
+        spritesets = {}
+        for orientation, (angle, flip_x, flip_y) in orientations.items():
+            spritesets[orientation] = Assets.pack_into_atlas([
+                pygame.transform.rotate(pygame.transform.flip(frame, flip_x, flip_y), angle) for frame in frames
+            ])
+        return spritesets
+
+    # Returns the frames with the color added to every pixel (alpha untouched), e.g. for flashing sprites
+    def load_tinted_spriteset(paths, size, tint):
+        key = (tuple(paths), size, tint)
+        if (key not in Assets.spritesets):
+            Assets.spritesets[key] = Assets.build_tinted_spriteset(paths, size, tint)
+        return Assets.spritesets[key]
+
+    def build_tinted_spriteset(paths, size, tint):
+        tinted_frames = []
+        for frame in Assets.load_spriteset(paths, size):
+            tinted_frame = frame.copy()
+            tinted_frame.fill(tint, special_flags=pygame.BLEND_RGB_ADD)
+            tinted_frames.append(tinted_frame)
+        return Assets.pack_into_atlas(tinted_frames)
+
+    # Copies the surfaces side by side into one surface and returns subsurfaces of it in the same order
+    def pack_into_atlas(surfaces):
+        atlas = pygame.Surface((sum(surface.get_width() for surface in surfaces), 
+            max(surface.get_height() for surface in surfaces)), pygame.SRCALPHA)
+        atlas.fill((0, 0, 0, 0))
+
+        frames = []
+        x = 0
+        for surface in surfaces:
+            frame_area = pygame.Rect(x, 0, surface.get_width(), surface.get_height())
+            # Max blending into the empty atlas copies the pixels (alpha included) as they are
+            atlas.blit(surface, frame_area, special_flags=pygame.BLEND_RGBA_MAX)
+            frames.append(atlas.subsurface(frame_area))
+            x += surface.get_width()
+
+        return frames
+
+    def clear():
+        Assets.images = {}
+        Assets.scaled_images = {}
+        Assets.spritesets = {}
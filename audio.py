@@ -0,0 +1,94 @@
+import pygame
+import environment as env
+import userevents as ue
+
+# Plays the game's sounds (see environment.SFX) over a fixed set of mixer channels, instead of whichever channel
+# pygame finds free. The first channels are reserved, pygame never hands them out for other sounds:
+# munch sounds have a channel of their own, so every pellet cuts the previous munch short instead of piling up,
+# and the sounds that matter (eating a ghost, dying) have one where a sound only cuts off sounds of lower
+# or equal priority. The other sounds share the channels left over, the oldest one is stopped when all are busy
+# The long loops (siren, power pellet) are streamed by pygame.mixer.music, one at a time
+class SoundPlayer:
+    CHANNEL_COUNT = 8
+
+    MUNCH_CHANNEL = 0
+    PRIORITY_CHANNEL = 1
+    RESERVED_CHANNEL_COUNT = 2
+
+    # Sounds played on the priority channel
+    PRIORITIES = {
+        "EAT_GHOST": 1,
+        "DEATH_1": 2
+    }
+
+    # Needs the mixer, see SFX.load()
+    def __init__(self):
+        pygame.mixer.set_num_channels(SoundPlayer.CHANNEL_COUNT)
+        pygame.mixer.set_reserved(SoundPlayer.RESERVED_CHANNEL_COUNT)
+        self.munch_channel = pygame.mixer.Channel(SoundPlayer.MUNCH_CHANNEL)
+        self.priority_channel = pygame.mixer.Channel(SoundPlayer.PRIORITY_CHANNEL)
+
+        # Priority of the last sound played on the priority channel
+        self.priority = 0
+
+        # Pac-Man has two munch sounds for pellets that switch between one and the other
+        self.current_munch = 1
+
+        # Name of the streamed loop that is playing (see SFX.STREAMED_SOUNDS)
+        self.music = None
+
+        # Priority sounds not played because one of higher priority was still playing
+        self.skipped_count = 0
+
+    def play(self, sound):
+        pygame.mixer.find_channel(True).play(sound)
+
+    def play_munch(self):
+        if (self.current_munch == 1):
+            self.munch_channel.play(env.SFX.MUNCH_1)
+            self.current_munch = 2
+        else:
+            self.munch_channel.play(env.SFX.MUNCH_2)
+            self.current_munch = 1
+
+    def play_priority(self, name):
+        priority = SoundPlayer.PRIORITIES[name]
+        if (self.priority_channel.get_busy() and priority < self.priority):
+            self.skipped_count += 1
+            return
+
+        self.priority_channel.play(getattr(env.SFX, name))
+        self.priority = priority
+
+    # Switches the stream over to another loop, nothing happens if that loop is already playing
+    def play_music(self, name):
+        if (name == self.music):
+            return
+
+        pygame.mixer.music.load(env.SFX.get_streamed_path(name))
+        pygame.mixer.music.set_volume(env.SFX.STREAMED_SOUNDS[name][1])
+        pygame.mixer.music.play(-1)
+        self.music = name
+
+    def stop_music(self):
+        pygame.mixer.music.stop()
+        self.music = None
+
+    # The power pellet loop takes over from the siren while a power pellet is active
+    def update_music(self, power_pellet_active):
+        self.play_music("SUPER_PELLET" if power_pellet_active else "SIREN_1")
+
+    def play_event_sounds(self, events):
+        for event in events:
+            if (event == ue.UserEvents.ATE_REGULAR_PELLET):
+                self.play_munch()
+            elif (event == ue.UserEvents.ATE_GHOST):
+                self.play_priority("EAT_GHOST")
+
+    def play_death(self):
+        self.stop_music()
+        self.play_priority("DEATH_1")
+
+    # Number of mixer channels playing a sound, the stream not counted
+    def get_busy_channel_count():
+        return sum(1 for index in range(pygame.mixer.get_num_channels()) if pygame.mixer.Channel(index).get_busy())
@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import characters as char
+import environment as env
+import simulation as sim
+import userevents as ue
+
+# Games stop here if Pac-Man is still alive, so a policy that never gets caught can't run forever
+MAX_TICKS = 24 * 60 * 5
+
+# Chance per tick that a wandering Pac-Man picks a new direction
+WANDER_TURN_CHANCE = 0.1
+
+# Games sent to a worker at a time. Bigger chunks cost less communication, smaller ones spread the games more evenly
+CHUNKS_PER_WORKER = 8
+
+# Keeps going the same way and now and then turns somewhere else, like a player exploring the maze
+def wander_policy(seed):
+    generator = random.Random(seed)
+    direction = None
+    while True:
+        if (generator.random() < WANDER_TURN_CHANCE):
+            direction = generator.choice(list(char.Direction))
+        yield direction
+
+# Picks a new direction every tick
+def random_policy(seed):
+    generator = random.Random(seed)
+    directions = list(char.Direction)
+    while True:
+        yield generator.choice(directions)
+
+POLICIES = {
+    "wander": wander_policy,
+    "random": random_policy,
+}
+
+# Ghost settings the games are played with, applied in every worker before its first game
+# patrols maps ghost indices (in the level's order, see sim.GHOSTS) to the patrol points that replace the level's
+# Ghosts are told apart by index, several of them can have the same color
+def apply_tuning(chase_distance, patrols):
+    if (chase_distance is not None):
+        char.Ghost.PAC_MAN_CHASE_DISTANCE = chase_distance
+
+    sim.GHOSTS = [(spawn_pos, color, patrols.get(index, patrol_points))
+        for index, (spawn_pos, color, patrol_points) in enumerate(sim.GHOSTS)]
+
+# Index of the ghost that caught Pac-Man, None if he is still alive
+def find_catcher(simulation):
+    if (not simulation.game_over):
+        return None
+
+    for index, ghost in enumerate(simulation.ghosts):
+        if (ghost.current_state == char.GhostState.CHASE
+            and ghost.eat_collider.colliderect(simulation.pac_man.body_collider)):
+            return index
+    return None
+
+# Plays one headless game and returns its result as a dict that can be written as JSON
+def play_game(seed, policy, max_ticks):
+    simulation = sim.Simulation()
+    directions = POLICIES[policy](seed)
+
+    pellets_eaten = 0
+    ghosts_eaten = 0
+    while (simulation.tick < max_ticks and not simulation.game_over):
+        for event in simulation.step(next(directions)):
+            if (event == ue.UserEvents.ATE_REGULAR_PELLET or event == ue.UserEvents.ATE_SUPER_PELLET):
+                pellets_eaten += 1
+            elif (event == ue.UserEvents.ATE_GHOST):
+                ghosts_eaten += 1
+
+    if (simulation.game_over):
+        catcher = find_catcher(simulation)
+        death_cause = "caught by " + ("ghost {}".format(catcher) if catcher is not None else "a ghost")
+    else:
+        death_cause = "survived"
+
+    return {
+        "seed": seed,
+        "score": simulation.score,
+        "ticks": simulation.tick,
+        "level": simulation.level,
+        "pellets_eaten": pellets_eaten,
+        "ghosts_eaten": ghosts_eaten,
+        "death_cause": death_cause,
+    }
+
+def play_game_task(arguments):
+    return play_game(*arguments)
+
+# Plays the games on a pool of worker processes and yields their results as they finish, in seed order
+# Every game only depends on its seed, so the results don't depend on the number of workers
+def run_games(seeds, policy, max_ticks, workers, chase_distance=None, patrols=None):
+    if (patrols is None):
+        patrols = {}
+
+    tasks = [(seed, policy, max_ticks) for seed in seeds]
+    chunk_size = max(1, len(tasks) // (workers * CHUNKS_PER_WORKER))
+
+    with ProcessPoolExecutor(workers, initializer=apply_tuning, initargs=(chase_distance, patrols)) as executor:
+        yield from executor.map(play_game_task, tasks, chunksize=chunk_size)
+
+# Mean with its standard error and the spread of a value over all the games
+def summarize(values):
+    values = sorted(values)
+    summary = {
+        "mean": statistics.fmean(values),
+        "stderr": statistics.stdev(values) / len(values) ** 0.5 if len(values) > 1 else 0.0,
+        "min": values[0],
+        "max": values[-1],
+    }
+    for percent in (10, 50, 90):
+        summary["p{}".format(percent)] = values[min(len(values) - 1, len(values) * percent // 100)]
+    return summary
+
+def build_report(results, duration):
+    death_causes = {}
+    for result in results:
+        death_causes[result["death_cause"]] = death_causes.get(result["death_cause"], 0) + 1
+
+    return {
+        "games": len(results),
+        "seconds": duration,
+        "games_per_second": len(results) / duration,
+        "score": summarize([result["score"] for result in results]),
+        "ticks": summarize([result["ticks"] for result in results]),
+        "pellets_eaten": summarize([result["pellets_eaten"] for result in results]),
+        "ghosts_eaten": summarize([result["ghosts_eaten"] for result in results]),
+        "death_causes": dict(sorted(death_causes.items())),
+    }
+
+def print_report(report, file):
+    print("{} games in {:.1f} s ({:.1f} games/s)".format(report["games"], report["seconds"],
+        report["games_per_second"]), file=file)
+    for name in ("score", "ticks", "pellets_eaten", "ghosts_eaten"):
+        summary = report[name]
+        print("{:14} mean {:10.1f} +- {:7.1f}  p10 {:8}  p50 {:8}  p90 {:8}".format(name, summary["mean"],
+            summary["stderr"], summary["p10"], summary["p50"], summary["p90"]), file=file)
+    for cause, count in report["death_causes"].items():
+        print("{:14} {:6} ({:.1%})".format(cause, count, count / report["games"]), file=file)
+
+# Returns (ghost index, patrol points) from the two values of a --patrol argument
+def parse_patrol(ghost, points):
+    try:
+        index = int(ghost)
+    except ValueError:
+        raise ValueError("expected a ghost index, found {!r}".format(ghost))
+    if (not 0 <= index < len(sim.GHOSTS)):
+        raise ValueError("the level has ghosts 0 to {}".format(len(sim.GHOSTS) - 1))
+
+    patrol_points = []
+    for point in points.split(","):
+        try:
+            x, y = (int(coordinate) for coordinate in point.split())
+        except ValueError:
+            raise ValueError("expected tiles as two numbers, separated by commas, found {!r}".format(point.strip()))
+        patrol_points.append((x, y))
+
+    for point in patrol_points:
+        if (not env.Map.LEVEL.is_walkable(*point)):
+            raise ValueError("{} is not a walkable tile".format(point))
+    return index, patrol_points
+
+# Plays many headless games in parallel to measure how ghost settings change the outcome of the games
+# Usage: python batch.py --games 10000 --chase-distance 8 --patrol 0 "1 1, 12 1, 12 11, 6 11"
+# Every game's result is written as a line of JSON to --results, the report to the standard output
+def main():
+    parser = argparse.ArgumentParser(description="Plays headless games in parallel and reports their outcome")
+    parser.add_argument("--games", type=int, default=1000, help="number of games (default 1000)")
+    parser.add_argument("--first-seed", type=int, default=0, help="seed of the first game, the others count up")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="wander", help="how Pac-Man is steered")
+    parser.add_argument("--max-ticks", type=int, default=MAX_TICKS, help="ticks after which a game is stopped")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: one per core)")
+    parser.add_argument("--chase-distance", type=int, help="override Ghost.PAC_MAN_CHASE_DISTANCE")
+    parser.add_argument("--patrol", nargs=2, action="append", default=[], metavar=("GHOST", "POINTS"),
+        help="replace the patrol points of a ghost, by its index in the level, e.g. 0 \"1 1, 12 1, 12 11\"")
+    parser.add_argument("--results", metavar="PATH", help="write the result of every game to PATH, as JSON lines")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    arguments = parser.parse_args()
+
+    patrols = {}
+    for ghost, points in arguments.patrol:
+        try:
+            index, patrol_points = parse_patrol(ghost, points)
+        except ValueError as error:
+            parser.error("--patrol {}: {}".format(ghost, error))
+        patrols[index] = patrol_points
+
+    seeds = range(arguments.first_seed, arguments.first_seed + arguments.games)
+    results_file = open(arguments.results, "w") if arguments.results is not None else None
+
+    results = []
+    start = time.perf_counter()
+    for result in run_games(seeds, arguments.policy, arguments.max_ticks, arguments.workers,
+        arguments.chase_distance, patrols):
+        results.append(result)
+        if (results_file is not None):
+            results_file.write(json.dumps(result) + "\n")
+    duration = time.perf_counter() - start
+
+    if (results_file is not None):
+        results_file.close()
+
+    report = build_report(results, duration)
+    if (arguments.json):
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report, sys.stdout)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Reports the time to set up a game and the memory held by its sprites,
+# with the shared asset cache and with every character and pellet loading its own copies
+# Run from the project root: python -m benchmarks.assets
+import os
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import environment as env
+import simulation as sim
+from assets import Assets
+
+REPEATS = 5
+
+
+def collect_sprites(simulation):
+    sprites = []
+    for pellet_class in env.Pellets.PELLET_CLASSES:
+        sprites.append(simulation.pellets.get_sprite(pellet_class))
+    for character in [simulation.pac_man] + simulation.ghosts:
+        for name in dir(character):
+            if (name.endswith("_SPRITESET")):
+                sprites.extend(getattr(character, name))
+            elif (name.endswith("_SPRITESETS")):
+                for spriteset in getattr(character, name).values():
+                    sprites.extend(spriteset)
+    return sprites
+
+
+# Bytes of pixel data behind the sprites, counting every surface (or atlas of subsurfaces) once
+def measure_sprite_memory(sprites):
+    surfaces = {}
+    for sprite in sprites:
+        surface = sprite.get_parent() or sprite
+        surfaces[id(surface)] = surface
+    return len(surfaces), sum(surface.get_width() * surface.get_height() * surface.get_bytesize() 
+        for surface in surfaces.values())
+
+
+def measure_startup(window):
+    load_times = []
+    for _ in range(REPEATS):
+        Assets.clear()
+        start = time.perf_counter()
+        simulation = sim.Simulation(window)
+        load_times.append(time.perf_counter() - start)
+
+    surface_count, memory = measure_sprite_memory(collect_sprites(simulation))
+    return min(load_times), surface_count, memory
+
+
+def main():
+    pygame.init()
+    window = pygame.display.set_mode((env.Map.MAP_WIDTH * env.Map.SCALING, env.Map.MAP_HEIGHT * env.Map.SCALING))
+    env.load_resources()
+
+    shared = measure_startup(window)
+
+    # Without the cache every request loads and scales its own copy, as the characters and pellets used to
+    cached_functions = (Assets.load_image, Assets.load_scaled_image, Assets.load_spriteset)
+    Assets.load_image = pygame.image.load
+    Assets.load_scaled_image = Assets.build_scaled_image
+    Assets.load_spriteset = Assets.build_spriteset
+    separate = measure_startup(window)
+    Assets.load_image, Assets.load_scaled_image, Assets.load_spriteset = cached_functions
+
+    for name, (load_time, surface_count, memory) in (("Separate copies", separate), ("Shared cache", shared)):
+        print("{:16} setup {:7.2f} ms, {:4} sprite surfaces, {:8.1f} KiB".format(
+            name, load_time * 1000, surface_count, memory / 1024))
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# Audio memory and mixer load. Reports the bytes held by the decoded sounds, with the long loops streamed
+# and as if they were decoded too, and the CPU time the process spends while the sounds of a game play in real time:
+# with pygame picking a channel for every sound and the loops decoded (as the game played them before SoundPlayer),
+# and with SoundPlayer
+# Run from the project root: python -m benchmarks.audio
+import os
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import audio
+import environment as env
+import simulation as sim
+import userevents as ue
+from benchmarks.rendering import scripted_directions
+
+# Playback starts this many ticks before the first power pellet is eaten
+LEAD_TICKS = 2 * sim.TICKS_PER_SECOND
+PLAYBACK_TICKS = 10 * sim.TICKS_PER_SECOND
+
+
+# Events of every tick of a scripted game, with whether a power pellet was active after the tick
+# The game goes on after the ghosts catch Pac-Man, so it always gets to the power pellets
+def record_game(seed=0):
+    simulation = sim.Simulation()
+    directions = scripted_directions(seed)
+    ticks = []
+    first_power_pellet = None
+    while (first_power_pellet is None or len(ticks) < first_power_pellet + PLAYBACK_TICKS):
+        events = [event for event in simulation.step(next(directions)) if event != ue.UserEvents.GAME_OVER]
+        if (first_power_pellet is None and ue.UserEvents.ATE_SUPER_PELLET in events):
+            first_power_pellet = len(ticks)
+        ticks.append((events, simulation.active_power_pellets > 0))
+
+    start = max(first_power_pellet - LEAD_TICKS, 0)
+    return ticks[start:start + PLAYBACK_TICKS]
+
+
+# The way the game played its sounds before the channel pool, the loops decoded into Sound objects
+class UnpooledPlayer:
+    def __init__(self):
+        pygame.mixer.set_reserved(0)
+        self.siren = load_streamed_sound("SIREN_1")
+        self.power_pellet = load_streamed_sound("SUPER_PELLET")
+        self.current_munch = 1
+        self.dropped_count = 0
+
+    def start(self):
+        self.siren.play(-1)
+
+    def play(self, sound, **kwargs):
+        if (sound.play(**kwargs) is None):
+            self.dropped_count += 1
+
+    def play_tick(self, events, power_pellet_active):
+        for event in events:
+            if (event == ue.UserEvents.ATE_REGULAR_PELLET):
+                self.play(env.SFX.MUNCH_1 if self.current_munch == 1 else env.SFX.MUNCH_2)
+                self.current_munch = 3 - self.current_munch
+            elif (event == ue.UserEvents.ATE_SUPER_PELLET):
+                self.power_pellet.stop()
+                self.play(self.power_pellet, loops=-1, maxtime=int(sim.POWER_PELLET_DURATION * 1000))
+            elif (event == ue.UserEvents.ATE_GHOST):
+                self.play(env.SFX.EAT_GHOST)
+
+    def stop(self):
+        pygame.mixer.stop()
+
+
+class PooledPlayer:
+    def __init__(self):
+        self.player = audio.SoundPlayer()
+        self.dropped_count = 0
+
+    def start(self):
+        self.player.update_music(False)
+
+    def play_tick(self, events, power_pellet_active):
+        self.player.play_event_sounds(events)
+        self.player.update_music(power_pellet_active)
+
+    def stop(self):
+        self.player.stop_music()
+        pygame.mixer.stop()
+        self.dropped_count = self.player.skipped_count
+
+
+def load_streamed_sound(name):
+    sound = pygame.mixer.Sound(env.SFX.get_streamed_path(name))
+    sound.set_volume(env.SFX.STREAMED_SOUNDS[name][1])
+    return sound
+
+
+# Plays the ticks at the game's speed, returns the CPU time per second of playback and the most busy channels
+def play_back(player, ticks):
+    tick_duration = 1 / sim.TICKS_PER_SECOND
+    most_busy_channels = 0
+
+    start_cpu = time.process_time()
+    start = time.perf_counter()
+    player.start()
+    for i, (events, power_pellet_active) in enumerate(ticks):
+        player.play_tick(events, power_pellet_active)
+        most_busy_channels = max(most_busy_channels, audio.SoundPlayer.get_busy_channel_count())
+
+        delay = start + (i + 1) * tick_duration - time.perf_counter()
+        if (delay > 0):
+            time.sleep(delay)
+    cpu_time = time.process_time() - start_cpu
+    wall_time = time.perf_counter() - start
+    player.stop()
+
+    return cpu_time / wall_time, most_busy_channels
+
+
+def main():
+    env.SFX.load()
+    env.SFX.wait_until_loaded()
+
+    decoded_size = env.SFX.get_decoded_size()
+    streamed_size = sum(len(load_streamed_sound(name).get_raw()) for name in env.SFX.STREAMED_SOUNDS)
+    mixer_frequency, mixer_format, mixer_channels = pygame.mixer.get_init()
+    print("Mixer: {} Hz, {} bit, {} channels".format(mixer_frequency, abs(mixer_format), mixer_channels))
+    print("Decoded sounds:            {:8.1f} KiB".format(decoded_size / 1024))
+    print("With the loops decoded:    {:8.1f} KiB".format((decoded_size + streamed_size) / 1024))
+
+    ticks = record_game()
+    event_count = sum(len(events) for events, power_pellet_active in ticks)
+    print("Playback: {} ticks, {} sound events".format(len(ticks), event_count))
+
+    for label, player_class in [("Unpooled", UnpooledPlayer), ("SoundPlayer", PooledPlayer)]:
+        player = player_class()
+        cpu_share, most_busy_channels = play_back(player, ticks)
+        print("{:12} {:6.2f}% CPU, at most {} channels busy, {} sounds dropped or skipped".format(label,
+            cpu_share * 100, most_busy_channels, player.dropped_count))
+
+    start = time.perf_counter()
+    player = audio.SoundPlayer()
+    for _ in range(20):
+        player.update_music(True)
+        player.update_music(False)
+    print("Switching streams: {:8.2f} ms".format((time.perf_counter() - start) / 40 * 1000))
+    player.stop_music()
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
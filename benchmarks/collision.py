@@ -0,0 +1,72 @@
+# Compares the collision grid in Walls with testing a rectangle against every wall collider
+# Run from the project root: python -m benchmarks.collision
+import os
+import random
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import environment as env
+
+QUERIES = 200000
+
+
+def linear_scan(rect, colliders):
+    for collider in colliders:
+        if (rect.colliderect(collider)):
+            return True
+    return False
+
+
+def time_queries(walls, rects):
+    start = time.perf_counter()
+    scan_results = [linear_scan(rect, walls.wall_colliders) for rect in rects]
+    scan_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    grid_results = [walls.collides(rect) for rect in rects]
+    grid_time = time.perf_counter() - start
+
+    assert scan_results == grid_results
+
+    return scan_time / len(rects), grid_time / len(rects)
+
+
+def main():
+    walls = env.Walls(env.Map.FIELD_OFFSET)
+    size = 16 * env.Map.SCALING
+
+    generator = random.Random(0)
+    rects = [pygame.Rect(generator.randrange(env.Map.MAP_WIDTH * env.Map.SCALING), 
+        generator.randrange(env.Map.MAP_HEIGHT * env.Map.SCALING), size, size) for _ in range(QUERIES)]
+    # Characters spend almost all their time in free corridors, where the linear scan has to test every wall
+    free_rects = [rect for rect in rects if not walls.collides(rect)]
+
+    print("Wall colliders: {}, grid {}x{} cells of {} px".format(len(walls.wall_colliders), 
+        walls.collision_grid.columns, walls.collision_grid.rows, walls.collision_grid.cell_size))
+    for name, queries in (("random positions", rects), ("free positions", free_rects)):
+        scan_time, grid_time = time_queries(walls, queries)
+        print("{:16} linear scan {:6.3f} us/query, collision grid {:6.3f} us/query".format(
+            name, scan_time * 1e6, grid_time * 1e6))
+
+
+    # The same maze tiled side by side, to show that the grid's cost stays flat as the wall count grows
+    for copies in (4, 16):
+        tiled_walls = env.Walls(env.Map.FIELD_OFFSET)
+        map_width = env.Map.MAP_WIDTH * env.Map.SCALING
+        tiled_walls.wall_colliders = [collider.move(map_width * copy, 0) 
+            for copy in range(copies) for collider in walls.wall_colliders]
+        tiled_walls.collision_grid = env.CollisionGrid(tiled_walls.wall_colliders, 
+            map_width * copies, env.Map.MAP_HEIGHT * env.Map.SCALING)
+        tiled_rects = [rect.move(map_width * generator.randrange(copies), 0) for rect in free_rects]
+
+        scan_time, grid_time = time_queries(tiled_walls, tiled_rects)
+        print("{:16} linear scan {:6.3f} us/query, collision grid {:6.3f} us/query".format(
+            "{} walls".format(len(tiled_walls.wall_colliders)), scan_time * 1e6, grid_time * 1e6))
+
+
+if __name__ == "__main__":
+    main()
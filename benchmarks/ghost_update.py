@@ -0,0 +1,60 @@
+# Compares the per-frame cost of updating the ghosts with and without the precomputed path table
+# Run from the project root: python -m benchmarks.ghost_update
+import os
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import characters as char
+import environment as env
+
+FRAMES = 2000
+
+
+def create_ghosts(window):
+    return [
+        char.Ghost(window, (1, 1), char.GhostColor.RED, [(1, 1), (12, 1), (12, 11), (6, 11)]),
+        char.Ghost(window, (1, 29), char.GhostColor.RED, [(1, 29), (7, 23), (12, 29)]),
+        char.Ghost(window, (26, 1), char.GhostColor.RED, [(27-1, 29), (27-12, 1), (27-12, 11), (27-6, 11)]),
+        char.Ghost(window, (26, 29), char.GhostColor.RED, [(27-1, 29), (27-7, 23), (27-12, 29)])
+    ]
+
+
+def time_ghost_updates(window):
+    pac_man = char.PacMan(window, (13, 17))
+    walls = env.Walls(env.Map.FIELD_OFFSET)
+    ghosts = create_ghosts(window)
+
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        for ghost in ghosts:
+            ghost.update(walls, pac_man)
+    return (time.perf_counter() - start) / FRAMES
+
+
+def main():
+    pygame.init()
+    window = pygame.Surface((env.Map.MAP_WIDTH * env.Map.SCALING, env.Map.MAP_HEIGHT * env.Map.SCALING))
+    map_graph = env.Map.MAP_GRAPH
+
+    map_graph.clear_path_table()
+    search_time = time_ghost_updates(window)
+
+    start = time.perf_counter()
+    map_graph.build_path_table()
+    build_time = time.perf_counter() - start
+    table_time = time_ghost_updates(window)
+
+    print("Path table build:       {:8.2f} ms ({} tiles)".format(build_time * 1000, len(map_graph.points)))
+    print("Ghost update (search):  {:8.1f} us/frame".format(search_time * 1e6))
+    print("Ghost update (table):   {:8.1f} us/frame".format(table_time * 1e6))
+    print("Speedup:                {:8.2f}x".format(search_time / table_time))
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
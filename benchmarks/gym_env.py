@@ -0,0 +1,57 @@
+# Reports the steps per second of the Gym-style environment, next to those of the bare simulation it wraps
+# Run from the project root: python -m benchmarks.gym_env
+import os
+import random
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import gym_env
+import simulation as sim
+
+STEPS = 50000
+
+
+def random_actions(seed):
+    generator = random.Random(seed)
+    action = 0
+    while True:
+        if (generator.random() < 0.1):
+            action = generator.randrange(len(gym_env.GymEnvironment.ACTIONS))
+        yield action
+
+
+def time_environment():
+    environment = gym_env.GymEnvironment()
+    environment.reset(0)
+    actions = random_actions(0)
+
+    start = time.perf_counter()
+    for _ in range(STEPS):
+        observation, reward, done, info = environment.step(next(actions))
+        if (done):
+            environment.reset()
+    return time.perf_counter() - start
+
+
+def time_simulation():
+    simulation = sim.Simulation()
+    actions = random_actions(0)
+
+    start = time.perf_counter()
+    for _ in range(STEPS):
+        simulation.step(gym_env.GymEnvironment.ACTIONS[next(actions)])
+        if (simulation.game_over):
+            simulation = sim.Simulation()
+    return time.perf_counter() - start
+
+
+def main():
+    for name, run in (("Simulation", time_simulation), ("Environment", time_environment)):
+        duration = run()
+        print("{:12} {:8.0f} steps/s, {:6.1f} us/step".format(name, STEPS / duration, duration / STEPS * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# Compares hierarchical path search (ClusterGraph) and the corridor graph with the flat A* of MapGraph
+# on a large generated maze
+# Run from the project root: python -m benchmarks.large_maze [SIZE]
+# Reports the time per query, the memory of the search structures and how much longer the hierarchical paths are
+# than the shortest ones, query by query, on the maze and on an open map with wide border crossings
+import random
+import sys
+import time
+import tracemalloc
+
+from cluster_graph import ClusterGraph
+from corridor_graph import CorridorGraph
+from map_graph import MapGraph, FlowField
+
+DEFAULT_SIZE = 501
+FLAT_QUERIES = 30
+HIERARCHICAL_QUERIES = 300
+MEMORY_QUERIES = 10
+
+# Hierarchical paths are checked against the exact distances to this many finishes, from every tile of the
+# finish's cluster (short queries) and from STRETCH_FAR_STARTS random tiles
+STRETCH_FINISHES = 20
+STRETCH_FAR_STARTS = 50
+
+# Open map of scattered walls, where borders can be crossed over long runs of tiles
+OPEN_MAP_SIZE = 128
+OPEN_WALL_CHANCE = 0.2
+
+# Chance of knocking down an extra wall, so the maze has loops like a Pac-Man maze instead of one way everywhere
+LOOP_CHANCE = 0.1
+
+
+# A maze of size x size tiles (odd sizes leave a wall around it) in the format MapGraph.FromMapString reads
+# Cells on odd coordinates are carved into a spanning tree by a randomized depth-first search
+def generate_maze(size, seed):
+    generator = random.Random(seed)
+    tiles = [["X"] * size for _ in range(size)]
+
+    tiles[1][1] = "O"
+    stack = [(1, 1)]
+    while stack:
+        x, y = stack[-1]
+        unvisited = [(x + dx, y + dy) for dx, dy in ((2, 0), (-2, 0), (0, 2), (0, -2))
+            if 0 < x + dx < size - 1 and 0 < y + dy < size - 1 and tiles[y + dy][x + dx] == "X"]
+        if (not unvisited):
+            stack.pop()
+            continue
+
+        next_x, next_y = generator.choice(unvisited)
+        tiles[(y + next_y) // 2][(x + next_x) // 2] = "O"
+        tiles[next_y][next_x] = "O"
+        stack.append((next_x, next_y))
+
+    for y in range(1, size - 1):
+        for x in range(1, size - 1):
+            between_horizontal = (x % 2 == 0 and y % 2 == 1)
+            between_vertical = (x % 2 == 1 and y % 2 == 0)
+            if ((between_horizontal or between_vertical) and generator.random() < LOOP_CHANCE):
+                tiles[y][x] = "O"
+
+    return "\n".join("".join(row) for row in tiles)
+
+
+def generate_open_map(size, seed):
+    generator = random.Random(seed)
+    return "\n".join("".join("X" if generator.random() < OPEN_WALL_CHANCE else "O" for _ in range(size))
+        for _ in range(size))
+
+
+def random_pairs(graph, count, seed):
+    generator = random.Random(seed)
+    points = sorted(graph.graph)
+    return [(generator.choice(points), generator.choice(points)) for _ in range(count)]
+
+
+# tracemalloc slows every allocation down, so the time and the memory of the queries are measured in separate runs
+def time_queries(find_path, pairs):
+    durations = []
+    for start, finish in pairs:
+        begin = time.perf_counter()
+        find_path(start, finish)
+        durations.append(time.perf_counter() - begin)
+
+    durations.sort()
+    return durations
+
+
+def measure_peak_memory(find_path, pairs):
+    peak_memory = 0
+    for start, finish in pairs:
+        tracemalloc.start()
+        find_path(start, finish)
+        peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return peak_memory
+
+
+def report(name, durations, peak_memory):
+    print("{:26} p50 {:9.3f} ms  p99 {:9.3f} ms  peak {:8.1f} KiB per query".format(name,
+        durations[len(durations) // 2] * 1000, durations[len(durations) * 99 // 100] * 1000, peak_memory / 1024))
+
+
+# Worst ratio of a hierarchical path's length to the shortest one, over short queries inside a cluster
+# and over random queries
+def report_stretch(name, graph, cluster_graph, seed):
+    generator = random.Random(seed)
+    points = sorted(graph.graph)
+    for label, is_short in (("same cluster", True), ("random", False)):
+        query_count = 0
+        longer_count = 0
+        worst_stretch = 1.0
+        worst_query = None
+        for finish in generator.sample(points, STRETCH_FINISHES):
+            distances = FlowField(graph, finish)
+            if (is_short):
+                starts = [point for point in points if cluster_graph.get_cluster(point) == cluster_graph.get_cluster(finish)]
+            else:
+                starts = generator.sample(points, STRETCH_FAR_STARTS)
+
+            for start in starts:
+                distance = distances.get_distance(start)
+                if (distance is None or distance == 0):
+                    continue
+                length = len(cluster_graph.get_shortest_path(start, finish)) - 1
+                query_count += 1
+                if (length > distance):
+                    longer_count += 1
+                if (length / distance > worst_stretch):
+                    worst_stretch = length / distance
+                    worst_query = (start, finish, length, distance)
+
+        print("{:26} {:13} {:6} queries, {:6.2%} longer, worst {:.2f}x{}".format(name, label, query_count,
+            longer_count / max(query_count, 1), worst_stretch,
+            "" if worst_query is None else " ({} -> {}: {} steps for {})".format(*worst_query)))
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE
+    graph = MapGraph.FromMapString(generate_maze(size, 0))
+    print("{0}x{0} maze, {1} walkable tiles".format(size, len(graph.graph)))
+
+    start = time.perf_counter()
+    cluster_graph = ClusterGraph(graph)
+    build_time = time.perf_counter() - start
+
+    tracemalloc.start()
+    measured_cluster_graph = ClusterGraph(graph)
+    build_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del measured_cluster_graph
+    print("Cluster graph: {} entrances, built in {:.2f} s, {:.1f} KiB".format(cluster_graph.get_entrance_count(),
+        build_time, build_memory / 1024))
+
+    pairs = random_pairs(graph, HIERARCHICAL_QUERIES, 1)
+    flat_pairs = pairs[:FLAT_QUERIES]
+    memory_pairs = pairs[:MEMORY_QUERIES]
+
+    flat_durations = time_queries(graph.get_shortest_path, flat_pairs)
+    report("Flat A*", flat_durations, measure_peak_memory(graph.get_shortest_path, memory_pairs))
+
+    corridor_graph = CorridorGraph(graph)
+    corridor_durations = time_queries(corridor_graph.get_shortest_path, flat_pairs)
+    report("Corridor graph A*", corridor_durations,
+        measure_peak_memory(corridor_graph.get_shortest_path, memory_pairs))
+
+    durations = time_queries(cluster_graph.get_shortest_path, pairs)
+
+    # The same queries again, answered from the path cache
+    cached_durations = time_queries(cluster_graph.get_shortest_path, pairs)
+    cached_memory = measure_peak_memory(cluster_graph.get_shortest_path, memory_pairs)
+
+    cluster_graph.clear_caches()
+    report("Hierarchical", durations, measure_peak_memory(cluster_graph.get_shortest_path, memory_pairs))
+    report("Hierarchical, cached", cached_durations, cached_memory)
+
+    report_stretch("Maze paths", graph, cluster_graph, 2)
+    open_graph = MapGraph.FromMapString(generate_open_map(OPEN_MAP_SIZE, 0))
+    report_stretch("Open map paths", open_graph, ClusterGraph(open_graph), 2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# Reports the memory held by a headless game and the cost of taking and restoring snapshots of it
+# Run from the project root: python -m benchmarks.memory
+import os
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import simulation as sim
+from benchmarks.rendering import scripted_directions
+
+GAMES = 500
+SNAPSHOTS = 20000
+
+
+def measure_game_memory():
+    # The first game builds everything shared between games (walls, path table), which isn't counted
+    sim.Simulation()
+
+    tracemalloc.start()
+    games = [sim.Simulation() for _ in range(GAMES)]
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return memory / len(games)
+
+
+def measure_snapshots():
+    simulation = sim.Simulation()
+    directions = scripted_directions(0)
+    for _ in range(200):
+        simulation.step(next(directions))
+
+    start = time.perf_counter()
+    for _ in range(SNAPSHOTS):
+        snapshot = simulation.get_snapshot()
+    take_time = (time.perf_counter() - start) / SNAPSHOTS
+
+    start = time.perf_counter()
+    for _ in range(SNAPSHOTS):
+        simulation.restore_snapshot(snapshot)
+    restore_time = (time.perf_counter() - start) / SNAPSHOTS
+
+    return take_time, restore_time
+
+
+def main():
+    print("Memory per game: {:8.1f} KiB".format(measure_game_memory() / 1024))
+
+    take_time, restore_time = measure_snapshots()
+    print("Snapshot: take {:6.2f} us, restore {:6.2f} us".format(take_time * 1e6, restore_time * 1e6))
+
+
+if __name__ == "__main__":
+    main()
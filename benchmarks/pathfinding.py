@@ -0,0 +1,125 @@
+# Compares the heap-based A* in MapGraph with the previous PriorityQueue search and with the search
+# over the junctions of the corridor graph, and counts how many searches the ghosts still run once they reuse their plans
+# Run from the project root: python -m benchmarks.pathfinding
+import os
+import time
+from queue import PriorityQueue
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import characters as char
+import environment as env
+from corridor_graph import CorridorGraph
+from map_graph import MapGraph
+from benchmarks.ghost_update import create_ghosts
+
+FRAMES = 2000
+# Every n-th tile is used as a start and as a finish, the old search is too slow for all 90000 pairs
+PAIR_STRIDE = 5
+
+
+# The search as it was before the heap rewrite. PriorityQueue.put's second argument is `block`,
+# so the frontier ends up ordered by the tile tuples instead of the f-cost
+def legacy_build_shortest_path(map_graph, start, finish):
+    expansions = 0
+    frontier = PriorityQueue()
+    frontier.put(start, 0)
+    came_from = {}
+    cost_so_far = {}
+    came_from[start] = None
+    cost_so_far[start] = 0
+
+    while not frontier.empty():
+        current = frontier.get()
+
+        if (current == finish):
+            break
+
+        expansions += 1
+        for next_move in map_graph.neighbors(current):
+            new_cost = cost_so_far[current] + 1
+            if next_move not in cost_so_far or new_cost < cost_so_far[next_move]:
+                cost_so_far[next_move] = new_cost
+                priority = new_cost + MapGraph.manhattan_distance(next_move, finish)
+                frontier.put(next_move, priority)
+                came_from[next_move] = current
+
+    return came_from, expansions
+
+
+def compare_searches(map_graph):
+    points = sorted(map_graph.graph)[::PAIR_STRIDE]
+    pairs = [(start, finish) for start in points for finish in points]
+
+    start_time = time.perf_counter()
+    legacy_expansions = 0
+    legacy_lengths = []
+    for start, finish in pairs:
+        came_from, expansions = legacy_build_shortest_path(map_graph, start, finish)
+        legacy_expansions += expansions
+        legacy_lengths.append(len(MapGraph.trace_shortest_path(came_from, start, finish)))
+    legacy_time = time.perf_counter() - start_time
+
+    map_graph.expansion_count = 0
+    start_time = time.perf_counter()
+    heap_lengths = []
+    for start, finish in pairs:
+        came_from = map_graph.build_shortest_path(start, finish)
+        heap_lengths.append(len(MapGraph.trace_shortest_path(came_from, start, finish)))
+    heap_time = time.perf_counter() - start_time
+
+    corridor_graph = CorridorGraph(map_graph)
+    start_time = time.perf_counter()
+    corridor_lengths = []
+    for start, finish in pairs:
+        corridor_lengths.append(len(corridor_graph.get_shortest_path(start, finish)))
+    corridor_time = time.perf_counter() - start_time
+
+    longer_paths = sum(1 for legacy, heap in zip(legacy_lengths, heap_lengths) if legacy > heap)
+    corridor_differences = sum(1 for heap, corridor in zip(heap_lengths, corridor_lengths) if heap != corridor)
+
+    print("Sampled pairs:        {} searches".format(len(pairs)))
+    print("PriorityQueue search: {:8.1f} expansions/query {:8.1f} us/query".format(
+        legacy_expansions / len(pairs), legacy_time / len(pairs) * 1e6))
+    print("Heap A*:              {:8.1f} expansions/query {:8.1f} us/query".format(
+        map_graph.expansion_count / len(pairs), heap_time / len(pairs) * 1e6))
+    print("Corridor graph A*:    {:8.1f} expansions/query {:8.1f} us/query ({} junctions for {} tiles)".format(
+        corridor_graph.expansion_count / len(pairs), corridor_time / len(pairs) * 1e6,
+        len(corridor_graph.nodes), len(map_graph.graph)))
+    print("Paths longer than optimal with the old search: {}".format(longer_paths))
+    print("Paths of another length with the corridor graph: {}".format(corridor_differences))
+
+
+def count_ghost_searches(map_graph, window):
+    pac_man = char.PacMan(window, (13, 17))
+    walls = env.Walls(env.Map.FIELD_OFFSET)
+    ghosts = create_ghosts(window)
+
+    map_graph.search_count = 0
+    start_time = time.perf_counter()
+    for _ in range(FRAMES):
+        for ghost in ghosts:
+            ghost.update(walls, pac_man)
+    frame_time = (time.perf_counter() - start_time) / FRAMES
+
+    print("Ghost updates with plan reuse: {:.3f} searches/frame {:8.1f} us/frame".format(
+        map_graph.search_count / FRAMES, frame_time * 1e6))
+
+
+def main():
+    pygame.init()
+    window = pygame.Surface((env.Map.MAP_WIDTH * env.Map.SCALING, env.Map.MAP_HEIGHT * env.Map.SCALING))
+    map_graph = env.Map.MAP_GRAPH
+    map_graph.clear_path_table()
+
+    compare_searches(map_graph)
+    count_ghost_searches(map_graph, window)
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Compares the frame time of the full redraw and the dirty rectangle renderers on the same game
+# Run from the project root: python -m benchmarks.rendering
+import os
+import random
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import characters as char
+import environment as env
+import hud
+import renderer as rd
+import simulation as sim
+
+FRAMES = 1500
+
+
+def scripted_directions(seed):
+    generator = random.Random(seed)
+    direction = None
+    while True:
+        if (generator.random() < 0.1):
+            direction = generator.choice(list(char.Direction))
+        yield direction
+
+
+def time_renderer(renderer_class, window, background):
+    simulation = sim.Simulation(window)
+    renderer = renderer_class(window, background, hud.Hud(env.Map.MAIN_FONT))
+    directions = scripted_directions(0)
+
+    frame_times = []
+    for _ in range(FRAMES):
+        simulation.step(next(directions))
+        if (simulation.game_over):
+            simulation = sim.Simulation(window)
+
+        start = time.perf_counter()
+        renderer.draw(simulation)
+        frame_times.append(time.perf_counter() - start)
+
+    frame_times.sort()
+    return sum(frame_times) / len(frame_times), frame_times[len(frame_times) * 95 // 100]
+
+
+def main():
+    pygame.init()
+    window = pygame.display.set_mode((env.Map.MAP_WIDTH * env.Map.SCALING, env.Map.MAP_HEIGHT * env.Map.SCALING))
+    env.load_resources()
+    background = pygame.transform.scale(env.Map.MAP_TEXTURE, 
+        (window.get_width(), window.get_height() - env.Map.FIELD_OFFSET * env.Map.SCALING))
+
+    for name, renderer_class in (("Full redraw", rd.FullRedrawRenderer), ("Dirty rectangles", rd.DirtyRectRenderer)):
+        mean, p95 = time_renderer(renderer_class, window, background)
+        print("{:17} mean {:7.1f} us/frame, p95 {:7.1f} us/frame".format(name, mean * 1e6, p95 * 1e6))
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Replays a corpus of recorded games headless and reports the simulation throughput
+# Run from the project root: python -m benchmarks.replay [RECORDING_DIR]
+# Without a directory, a corpus of scripted games is recorded first, so the number is comparable between commits
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import replay
+import simulation as sim
+from benchmarks.rendering import scripted_directions
+
+GAMES = 1000
+MAX_TICKS = 2000
+
+
+def record_corpus(directory):
+    for seed in range(GAMES):
+        recording = replay.InputRecording()
+        simulation = sim.Simulation(recording=recording)
+        directions = scripted_directions(seed)
+        while (simulation.tick < MAX_TICKS and not simulation.game_over):
+            simulation.step(next(directions))
+
+        recording.finish(simulation)
+        recording.save(os.path.join(directory, "{:04}.pacrec".format(seed)))
+
+
+def load_corpus(directory):
+    return [replay.InputRecording.load(os.path.join(directory, name))
+        for name in sorted(os.listdir(directory)) if name.endswith(".pacrec")]
+
+
+def main():
+    if (len(sys.argv) > 1):
+        recordings = load_corpus(sys.argv[1])
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            record_corpus(directory)
+            recordings = load_corpus(directory)
+
+    ticks = sum(recording.get_tick_count() for recording in recordings)
+    size = sum(len(recording.pack()) for recording in recordings)
+
+    diverged = 0
+    start = time.perf_counter()
+    for recording in recordings:
+        if (replay.replay(recording).score != recording.final_score):
+            diverged += 1
+    duration = time.perf_counter() - start
+
+    print("{} games, {} ticks, {:.1f} KiB of input".format(len(recordings), ticks, size / 1024))
+    print("Replay: {:.0f} ticks/s, {} diverged".format(ticks / duration, diverged))
+
+
+if __name__ == "__main__":
+    main()
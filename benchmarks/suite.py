@@ -0,0 +1,270 @@
+# Times the hot paths of the game and reports percentiles as JSON, or compares them against a stored baseline
+# Run from the project root:
+#   python -m benchmarks.suite --output baseline.json
+#   python -m benchmarks.suite --compare baseline.json
+# Every sample is one call of the measured function, preparation (resetting the board, placing the characters)
+# is left out of the timings
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import characters as char
+import environment as env
+import hud
+import renderer as rd
+import simulation as sim
+from map_graph import MapGraph
+from benchmarks.rendering import scripted_directions
+
+WARMUP = 20
+
+# Searching every pair of tiles without the path table takes minutes, so only every n-th finish is searched
+SEARCH_PAIR_STRIDE = 7
+
+# Ghosts are put back at their spawn this often, so every sample set covers the same part of their route
+GHOST_RESET_INTERVAL = 200
+GHOST_SPAWN_TILE = (1, 1)
+GHOST_PATROL_POINTS = [(1, 1), (12, 1), (12, 11), (6, 11)]
+CHASED_PAC_MAN_TILE = (6, 5)
+
+PERCENTILES = [50, 90, 99]
+
+# Calls run() count times after WARMUP untimed calls and returns the duration of every timed call
+# prepare(index) is called, untimed, before every call
+def measure(run, count, prepare=None):
+    samples = []
+    for index in range(WARMUP + count):
+        if (prepare is not None):
+            prepare(index)
+
+        start = time.perf_counter()
+        run()
+        duration = time.perf_counter() - start
+
+        if (index >= WARMUP):
+            samples.append(duration)
+    return samples
+
+
+def bench_shortest_path_table():
+    graph = MapGraph.FromMapString(env.Map.MAP_STRING)
+    graph.build_path_table()
+    return bench_shortest_paths(graph, 1)
+
+
+def bench_shortest_path_search():
+    return bench_shortest_paths(MapGraph.FromMapString(env.Map.MAP_STRING), SEARCH_PAIR_STRIDE)
+
+
+def bench_shortest_paths(graph, stride):
+    points = sorted(graph.graph)
+    pairs = [(start, finish) for start in points for finish in points[::stride]]
+    pair = []
+
+    def prepare(index):
+        pair[:] = pairs[index % len(pairs)]
+
+    return measure(lambda: graph.get_shortest_path(pair[0], pair[1]), len(pairs), prepare)
+
+
+def bench_map_graph_construction():
+    return measure(lambda: MapGraph.FromMapString(env.Map.MAP_STRING), 200)
+
+
+def bench_character_move():
+    walls = env.Walls(env.Map.FIELD_OFFSET)
+    pac_man = char.PacMan(None, sim.PAC_MAN_SPAWN_POINT)
+    directions = scripted_directions(0)
+    direction = []
+
+    def prepare(index):
+        direction[:] = [next(directions) or pac_man.direction]
+
+    return measure(lambda: pac_man.move(direction[0], walls), 20000, prepare)
+
+
+def bench_eat_pellets():
+    pellets = env.Pellets(None, env.Map.FIELD_OFFSET)
+    pac_man = char.PacMan(None, sim.PAC_MAN_SPAWN_POINT)
+    tiles = sorted(env.Map.MAP_GRAPH.graph)
+
+    # Pac-Man is put on every tile in turn, always with the full board in front of him
+    def prepare(index):
+        if (pellets.eaten_pellets):
+            pellets.reset()
+        tile = tiles[index % len(tiles)]
+        pac_man.body_collider.center = ((tile[0]*env.Map.TILE_SIZE + env.Map.TILE_SIZE//2)*env.Map.SCALING,
+            (tile[1]*env.Map.TILE_SIZE + env.Map.FIELD_OFFSET + env.Map.TILE_SIZE//2)*env.Map.SCALING)
+        pac_man.update_eat_collider()
+
+    return measure(lambda: pac_man.eat_pellets(pellets, []), 20000, prepare)
+
+
+def bench_ghost_update(state):
+    walls = env.Walls(env.Map.FIELD_OFFSET)
+    pac_man = char.PacMan(None, CHASED_PAC_MAN_TILE)
+    if (state == char.GhostState.PATROL):
+        # Too far away to ever be chased
+        pac_man.body_collider.y = 100 * env.Map.MAP_HEIGHT * env.Map.SCALING
+    ghost = []
+
+    def prepare(index):
+        if (index % GHOST_RESET_INTERVAL == 0 or ghost[0].get_current_tile() == pac_man.get_current_tile()):
+            ghost[:] = [char.Ghost(None, GHOST_SPAWN_TILE, char.GhostColor.RED, GHOST_PATROL_POINTS)]
+            if (state == char.GhostState.VULNERABLE):
+                ghost[0].put_on_vulnerability()
+            elif (state == char.GhostState.DEFEATED):
+                ghost[0].defeat()
+
+    return measure(lambda: ghost[0].update(walls, pac_man), 5000, prepare)
+
+
+def bench_simulation_step():
+    game = []
+    directions = scripted_directions(0)
+    direction = []
+
+    def prepare(index):
+        if (not game or game[0].game_over):
+            game[:] = [sim.Simulation()]
+        direction[:] = [next(directions)]
+
+    return measure(lambda: game[0].step(direction[0]), 5000, prepare)
+
+
+# One iteration of the main loop: a tick of the simulation and drawing the window
+def bench_frame(renderer_class):
+    window = pygame.display.get_surface()
+    background = pygame.transform.scale(env.Map.MAP_TEXTURE,
+        (window.get_width(), window.get_height() - env.Map.FIELD_OFFSET * env.Map.SCALING))
+    game = []
+    directions = scripted_directions(0)
+
+    def prepare(index):
+        if (not game or game[0].game_over):
+            game[:] = [sim.Simulation(window), renderer_class(window, background, hud.Hud(env.Map.MAIN_FONT))]
+
+    def run():
+        game[0].step(next(directions))
+        game[1].draw(game[0])
+
+    return measure(run, 2000, prepare)
+
+
+BENCHMARKS = {
+    "map_graph.get_shortest_path.table": bench_shortest_path_table,
+    "map_graph.get_shortest_path.search": bench_shortest_path_search,
+    "map_graph.from_map_string": bench_map_graph_construction,
+    "game_character.move": bench_character_move,
+    "pac_man.eat_pellets": bench_eat_pellets,
+    "ghost.update.patrol": lambda: bench_ghost_update(char.GhostState.PATROL),
+    "ghost.update.chase": lambda: bench_ghost_update(char.GhostState.CHASE),
+    "ghost.update.vulnerable": lambda: bench_ghost_update(char.GhostState.VULNERABLE),
+    "ghost.update.defeated": lambda: bench_ghost_update(char.GhostState.DEFEATED),
+    "simulation.step": bench_simulation_step,
+    "frame.full_redraw": lambda: bench_frame(rd.FullRedrawRenderer),
+    "frame.dirty_rects": lambda: bench_frame(rd.DirtyRectRenderer),
+}
+
+
+def percentile(sorted_samples, percent):
+    return sorted_samples[min(len(sorted_samples) - 1, len(sorted_samples) * percent // 100)]
+
+
+# Statistics of the samples, in microseconds
+def summarize(samples):
+    samples = sorted(samples)
+    summary = {
+        "samples": len(samples),
+        "mean_us": sum(samples) / len(samples) * 1e6,
+        "min_us": samples[0] * 1e6,
+        "max_us": samples[-1] * 1e6,
+    }
+    for percent in PERCENTILES:
+        summary["p{}_us".format(percent)] = percentile(samples, percent) * 1e6
+    return summary
+
+
+def run_benchmarks(name_filter):
+    pygame.init()
+    pygame.display.set_mode((env.Map.MAP_WIDTH * env.Map.SCALING, env.Map.MAP_HEIGHT * env.Map.SCALING))
+    env.load_resources()
+
+    results = {}
+    for name, benchmark in BENCHMARKS.items():
+        if (name_filter is None or name_filter in name):
+            results[name] = summarize(benchmark())
+            print("{:38} p50 {:10.2f} us  p90 {:10.2f} us  p99 {:10.2f} us".format(name,
+                results[name]["p50_us"], results[name]["p90_us"], results[name]["p99_us"]), file=sys.stderr)
+
+    pygame.quit()
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+        },
+        "benchmarks": results,
+    }
+
+
+# Returns the names of the benchmarks whose metric got worse than the baseline by more than the threshold
+def compare(results, baseline, metric, threshold):
+    regressions = []
+    for name, summary in results["benchmarks"].items():
+        if (name not in baseline["benchmarks"]):
+            print("{:38} new".format(name))
+            continue
+
+        before = baseline["benchmarks"][name][metric]
+        after = summary[metric]
+        change = after / before - 1 if before > 0 else 0
+
+        if (change > threshold):
+            verdict = "REGRESSION"
+            regressions.append(name)
+        elif (change < -threshold):
+            verdict = "faster"
+        else:
+            verdict = "ok"
+        print("{:38} {:10.2f} -> {:10.2f} us {:+7.1%}  {}".format(name, before, after, change, verdict))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", metavar="PATH", help="write the results to PATH instead of the standard output")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare the results with a stored run")
+    parser.add_argument("--metric", default="p50_us", help="statistic compared against the baseline")
+    parser.add_argument("--threshold", type=float, default=0.1,
+        help="relative slowdown that counts as a regression (default 0.1)")
+    parser.add_argument("--filter", metavar="TEXT", help="only run the benchmarks with TEXT in their name")
+    arguments = parser.parse_args()
+
+    results = run_benchmarks(arguments.filter)
+
+    if (arguments.output is not None):
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent=2)
+    elif (arguments.compare is None):
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if (arguments.compare is not None):
+        with open(arguments.compare) as file:
+            baseline = json.load(file)
+        if (compare(results, baseline, arguments.metric, arguments.threshold)):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Ghost swarms from 4 to 1000 ghosts. Compares ways of finding the ghosts Pac-Man touches (a test per ghost,
+# one pygame call over all the colliders, the simulation's ghost grid) and of finding, for every ghost,
+# the ghosts near it, and reports the cost of a whole tick
+# Run from the project root: python -m benchmarks.swarm
+import os
+import random
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import characters as char
+import environment as env
+import simulation as sim
+from benchmarks.rendering import scripted_directions
+
+GHOST_COUNTS = [4, 8, 25, 50, 100, 200, 500, 1000]
+TICKS = 100
+
+# Ghosts near a ghost are those on the tiles at most this far from its tile
+NEAR_RADIUS = 2
+
+
+# Ghosts spawn on random tiles and patrol the routes of the level's ghosts, colors cycle through GhostColor
+def create_swarm(count, seed=0):
+    generator = random.Random(seed)
+    tiles = sorted(env.Map.MAP_GRAPH.graph)
+    colors = list(char.GhostColor)
+    return [(generator.choice(tiles), colors[i % len(colors)], sim.GHOSTS[i % len(sim.GHOSTS)][2])
+        for i in range(count)]
+
+
+def find_touching_per_ghost(simulation):
+    pac_man = simulation.pac_man
+    return [ghost for ghost in simulation.ghosts if pac_man.eat_collider.colliderect(ghost.body_collider)]
+
+
+def find_touching_collide_list(simulation):
+    ghosts = simulation.ghosts
+    return [ghosts[index] for index in simulation.pac_man.eat_collider.collidelistall(simulation.ghost_bodies)]
+
+
+# The grid is brought up to date first, like on the first query of a tick
+def find_touching_grid(simulation):
+    simulation.ghost_grid_tick = None
+    return simulation.get_ghost_grid().find_overlapping(simulation.pac_man.eat_collider)
+
+
+def find_all_near_collide_list(simulation):
+    ghosts = simulation.ghosts
+    return [[ghosts[index] for index in env.Map.get_tile_area(ghost.get_current_tile(), NEAR_RADIUS).collidelistall(
+        simulation.ghost_bodies)] for ghost in ghosts]
+
+
+def find_all_near_grid(simulation):
+    simulation.ghost_grid_tick = None
+    grid = simulation.get_ghost_grid()
+    return [grid.find_overlapping(env.Map.get_tile_area(ghost.get_current_tile(), NEAR_RADIUS))
+        for ghost in simulation.ghosts]
+
+
+def same_ghosts(first, second):
+    return sorted(map(id, first)) == sorted(map(id, second))
+
+
+def run_swarm(count):
+    simulation = sim.Simulation(ghosts=create_swarm(count))
+    directions = scripted_directions(0)
+
+    queries = [find_touching_per_ghost, find_touching_collide_list, find_touching_grid,
+        find_all_near_collide_list, find_all_near_grid]
+    query_times = [0] * len(queries)
+    step_time = 0
+    mismatches = 0
+    for _ in range(TICKS):
+        start = time.perf_counter()
+        simulation.step(next(directions))
+        step_time += time.perf_counter() - start
+
+        results = []
+        for i, query in enumerate(queries):
+            start = time.perf_counter()
+            results.append(query(simulation))
+            query_times[i] += time.perf_counter() - start
+
+        touching_per_ghost, touching_collide_list, touching_grid, all_near_collide_list, all_near_grid = results
+        if (not same_ghosts(touching_per_ghost, touching_collide_list)
+            or not same_ghosts(touching_per_ghost, touching_grid)
+            or not all(same_ghosts(first, second) for first, second in zip(all_near_collide_list, all_near_grid))):
+            mismatches += 1
+
+    print("{:6d}".format(count) + "".join("{:13.1f}".format(query_time / TICKS * 1e6) for query_time in query_times)
+        + "{:13.1f} {:10d}".format(step_time / TICKS * 1e6, mismatches))
+
+
+def main():
+    print("Pac-Man's touching ghosts and every ghost's near ghosts (radius {} tiles), us per tick".format(NEAR_RADIUS))
+    print("{:>6}{:>13}{:>13}{:>13}{:>13}{:>13}{:>13} {:>10}".format("Ghosts", "Per ghost", "Collide list", "Grid",
+        "Near list", "Near grid", "Tick", "Mismatches"))
+    for count in GHOST_COUNTS:
+        run_swarm(count)
+
+
+if __name__ == "__main__":
+    main()
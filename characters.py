@@ -2,9 +2,11 @@ from math import floor
 import pygame
 import os
 from enum import Enum
-from queue import SimpleQueue
+from time import perf_counter
 
 import environment as env
+from assets import Assets
+import profiler
 import userevents as ue
 
 
@@ -16,19 +18,30 @@ class Direction(Enum):
     UP = 3
 
 # Abstract class for the game characters
+# Characters are slotted: many games can run in one process and every instance only holds its own state
 class GameCharacter:    
+    __slots__ = ["window", "direction", "speed", "current_spriteset", "current_frame", 
+        "body_collider", "eat_collider", "previous_position"]
+
     # All the characters are made of 4 tiles (2x2)
     CHARACTER_SPRITE_SIZE = [env.Map.TILE_SIZE * 2, env.Map.TILE_SIZE * 2]
     
     # Makes sure that simply touching an object with the side of the character doesn't make them eat the object
     EAT_COLLIDER_INNER_MARGIN = 3
 
+    # Moves longer than this (in scaled pixels) between two ticks are jumps, e.g. through the tunnel,
+    # and are drawn at the new position right away instead of being interpolated
+    MAX_INTERPOLATED_DISTANCE = env.Map.TILE_SIZE * env.Map.SCALING
+
+    # Without a window (headless simulation) no sprites are loaded and the character is never drawn
     def __init__(self, window, spawn_pos):
         self.window = window
         self.direction = Direction.RIGHT
 
         # Set up the animation
-        self.load_animation_frames()
+        if (self.window is not None):
+            self.load_animation_frames()
+        self.current_spriteset = []
         self.current_frame = 0
 
         spawn_pos_px = ((spawn_pos[0]*env.Map.TILE_SIZE - GameCharacter.CHARACTER_SPRITE_SIZE[0]//2 + env.Map.TILE_SIZE//2)*env.Map.SCALING, 
@@ -41,22 +54,52 @@ class GameCharacter:
             self.body_collider.y + self.EAT_COLLIDER_INNER_MARGIN*env.Map.SCALING, 
             self.body_collider.width - 2*self.EAT_COLLIDER_INNER_MARGIN*env.Map.SCALING, 
             self.body_collider.height - 2*self.EAT_COLLIDER_INNER_MARGIN*env.Map.SCALING)
+
+        # Where the character was before the last tick, used to draw it between ticks
+        self.previous_position = self.body_collider.topleft
     
     def load_animation_frames(self):
         pass
 
-    def animate(self):
-        self.draw_next_frame()    
+    # State that changes during a game, in a form that can be kept and restored later (see Simulation)
+    def get_snapshot(self):
+        return (self.body_collider.topleft, self.eat_collider.topleft, self.direction, self.speed, 
+            self.previous_position, self.current_frame)
+
+    def restore_snapshot(self, snapshot):
+        (self.body_collider.topleft, self.eat_collider.topleft, self.direction, self.speed, 
+            self.previous_position, self.current_frame) = snapshot
+
+    def get_sprite_size(self):
+        return (self.CHARACTER_SPRITE_SIZE[0]*env.Map.SCALING, self.CHARACTER_SPRITE_SIZE[1]*env.Map.SCALING)
+
+    # Returns the area of the window that was drawn on
+    # alpha is how far the game is between the previous tick and the current one (0 to 1)
+    # The animation only moves on to the next frame when a tick has passed since the last time it was drawn
+    def animate(self, alpha=1.0, new_tick=True):
+        if (new_tick):
+            self.advance_the_counter()
+        return self.draw_current_frame(alpha)
     
-    def draw_next_frame(self):
+    def draw_current_frame(self, alpha):
         self.set_spriteset()
         
         current_sprite = self.get_current_sprite()
 
         # Draw the sprite on the screen 
-        self.window.blit(current_sprite, (self.body_collider.x, self.body_collider.y))
+        return self.window.blit(current_sprite, self.get_draw_position(alpha))
+
+    def remember_position(self):
+        self.previous_position = self.body_collider.topleft
+
+    def get_draw_position(self, alpha):
+        previous_x, previous_y = self.previous_position
+        x, y = self.body_collider.topleft
 
-        self.advance_the_counter()       
+        if (abs(x - previous_x) > self.MAX_INTERPOLATED_DISTANCE 
+            or abs(y - previous_y) > self.MAX_INTERPOLATED_DISTANCE):
+            return (x, y)
+        return (round(previous_x + (x - previous_x)*alpha), round(previous_y + (y - previous_y)*alpha))
     
     def set_spriteset(self):
         pass
@@ -87,7 +130,7 @@ class GameCharacter:
         
         self.move_collider(next_move, direction)
                 
-        if (self.can_freely_move_to(next_move, walls.wall_colliders)):
+        if (self.can_freely_move_to(next_move, walls)):
             self.body_collider.x = next_move.x
             self.body_collider.y = next_move.y
             self.direction = direction
@@ -102,7 +145,7 @@ class GameCharacter:
 
         self.move_collider(next_move, next_direction)
 
-        if (self.can_freely_move_to(next_move, walls.wall_colliders)):
+        if (self.can_freely_move_to(next_move, walls)):
             self.body_collider.x = next_move.x
             self.body_collider.y = next_move.y
             self.direction = next_direction
@@ -117,11 +160,8 @@ class GameCharacter:
         elif (direction == Direction.DOWN):
             collider.y += self.speed
     
-    def can_freely_move_to(self, next_move, colliders):
-        for collider in colliders:
-            if (next_move.colliderect(collider)):
-                return False
-        return True
+    def can_freely_move_to(self, next_move, walls):
+        return not walls.collides(next_move)
 
     def update_eat_collider(self):
         self.eat_collider.x = self.body_collider.x + self.EAT_COLLIDER_INNER_MARGIN
@@ -140,61 +180,60 @@ class GameCharacter:
         pos[0] /= (env.Map.TILE_SIZE * env.Map.SCALING)
         pos[1] /= (env.Map.TILE_SIZE * env.Map.SCALING)
         
-        pos[0] = floor(pos[0])
+        # Inside the tunnel the character can be partly outside the map, the tile wraps around to the other side
+        pos[0] = floor(pos[0]) % (env.Map.MAP_WIDTH // env.Map.TILE_SIZE)
         pos[1] = floor(pos[1])
         
         return (pos[0], pos[1])
 
 class PacMan(GameCharacter):    
+    __slots__ = ["IDLE_SPRITESETS"]
+
     SPEED_IN_UNITS = 2
 
+    # Rotation (counterclockwise, in degrees) and flips of the sprites for each direction
+    ORIENTATIONS = {
+        Direction.RIGHT: (0, False, False),
+        Direction.UP: (90, False, False),
+        Direction.LEFT: (180, False, False),
+        Direction.DOWN: (270, False, False)
+    }
+
     def __init__(self, window, spawn_pos):
         self.speed = self.SPEED_IN_UNITS * env.Map.SCALING
         super().__init__(window, spawn_pos)
-        self.current_spriteset = self.IDLE_SPRITESET
+        if (self.window is not None):
+            self.current_spriteset = self.IDLE_SPRITESETS[self.direction]
     
     # Pac-Man has only one spriteset, with last two frames being identical to the first two ones (but in reversed order)
+    # To point Pac-Man in correct direction, the frames are rotated once when loading, one spriteset per direction
     def load_animation_frames(self):
-        self.IDLE_SPRITESET = []
-
-        self.IDLE_SPRITESET.append(pygame.transform.scale(
-            pygame.image.load(
-                os.path.join("Assets/Pac-Man", "Idle_0.png")
-            ), (self.CHARACTER_SPRITE_SIZE[0]*env.Map.SCALING, self.CHARACTER_SPRITE_SIZE[1]*env.Map.SCALING)))
-        self.IDLE_SPRITESET.append(pygame.transform.scale(
-            pygame.image.load(
-                os.path.join("Assets/Pac-Man", "Idle_1.png")
-            ), (self.CHARACTER_SPRITE_SIZE[0]*env.Map.SCALING, self.CHARACTER_SPRITE_SIZE[1]*env.Map.SCALING)))
-        self.IDLE_SPRITESET.append(pygame.transform.scale(
-            pygame.image.load(
-                os.path.join("Assets/Pac-Man", "Idle_2.png")
-            ), (self.CHARACTER_SPRITE_SIZE[0]*env.Map.SCALING, self.CHARACTER_SPRITE_SIZE[1]*env.Map.SCALING)))
-        self.IDLE_SPRITESET.append(self.IDLE_SPRITESET[1])
-        self.IDLE_SPRITESET.append(self.IDLE_SPRITESET[0])
+        spritesets = Assets.load_oriented_spritesets(
+            [os.path.join("Assets/Pac-Man", "Idle_{}.png".format(frame)) for frame in range(3)], 
+            self.get_sprite_size(), PacMan.ORIENTATIONS)
+
+        self.IDLE_SPRITESETS = {}
+        for direction, frames in spritesets.items():
+            self.IDLE_SPRITESETS[direction] = frames + [frames[1], frames[0]]
     
-    # To point Pac-Man in correct direction, we just have to rotate the sprite
+    # Turning doesn't restart the animation
+    def set_spriteset(self):
+        self.current_spriteset = self.IDLE_SPRITESETS[self.direction]
+
     def get_current_sprite(self):
-        rotation_angle = self.find_rotation_angle()
-        return pygame.transform.rotate(
-            self.current_spriteset[self.current_frame], rotation_angle
-        )
-    
-    def update(self, keys, walls, pellets, ghosts):
-        self.move(self.find_new_direction(keys), walls)
-        self.eat_pellets(pellets)
-        self.eat_ghosts(ghosts)
-        self.animate()
-
-    def find_rotation_angle(self):
-        if (self.direction == Direction.RIGHT):
-            return 0
-        elif (self.direction == Direction.UP):
-            return 90
-        elif (self.direction == Direction.LEFT):
-            return 180
-        elif (self.direction == Direction.DOWN):
-            return 270
+        return self.current_spriteset[self.current_frame]
     
+    # Game events (see UserEvents) are appended to the events list instead of going through pygame's event queue
+    # No direction means Pac-Man keeps going the way he is facing
+    # ghost_bodies are the body colliders of the ghosts, in the same order
+    def update(self, direction, walls, pellets, ghosts, ghost_bodies, events):
+        if (direction is None):
+            direction = self.direction
+
+        self.move(direction, walls)
+        self.eat_pellets(pellets, events)
+        self.eat_ghosts(ghosts, ghost_bodies, events)
+
     def find_new_direction(self, keys):
         if keys[pygame.K_w]:
             return Direction.UP
@@ -206,42 +245,37 @@ class PacMan(GameCharacter):
             return Direction.LEFT  
         return self.direction
     
-    def eat_pellets(self, pellets):
-        for pellet in pellets.regular_pellets:
-            if self.eat_collider.colliderect(pellet.collider):
-                pellets.regular_pellets.remove(pellet)
-                pygame.event.post(pygame.event.Event(ue.UserEvents.ATE_REGULAR_PELLET))
-                self.play_munch_sound()
+    def eat_pellets(self, pellets, events):
+        for tile in pellets.take_touching(env.RegularPellet, self.eat_collider):
+            events.append(ue.UserEvents.ATE_REGULAR_PELLET)
                 
-        for pellet in pellets.super_pellets:
-            if self.eat_collider.colliderect(pellet.collider):
-                pellets.super_pellets.remove(pellet)
-                pygame.event.post(pygame.event.Event(ue.UserEvents.ATE_SUPER_PELLET))
-    
-    # Pac-Man has two munch sounds for pellets that switch between one and the other
-    def play_munch_sound(self):
-        if (env.SFX.current_munch == 1):
-            env.SFX.MUNCH_1.play()
-            env.SFX.current_munch = 2
-        else:
-            env.SFX.MUNCH_2.play()
-            env.SFX.current_munch = 1
+        for tile in pellets.take_touching(env.SuperPellet, self.eat_collider):
+            events.append(ue.UserEvents.ATE_SUPER_PELLET)
 
-    def eat_ghosts(self, ghosts):
-        for ghost in ghosts:
+    # pygame tests all the colliders in one call, which stays cheap with hundreds of ghosts
+    def eat_ghosts(self, ghosts, ghost_bodies, events):
+        for index in self.eat_collider.collidelistall(ghost_bodies):
+            ghost = ghosts[index]
             if (ghost.current_state == GhostState.VULNERABLE):
-                if (self.eat_collider.colliderect(ghost.body_collider)):
-                    ghost.defeat()
-                    pygame.event.post(pygame.event.Event(ue.UserEvents.ATE_GHOST))
-                    env.SFX.EAT_GHOST.play()
+                ghost.defeat()
+                events.append(ue.UserEvents.ATE_GHOST)
 
 class Ghost(GameCharacter):
+    __slots__ = ["color", "current_state", "patrol_points", "patrol_index", "vulnerability_effect_count", "flashing",
+        "plan", "plan_index", "next_plan_point", "previous_plan_point", "plan_target",
+        "IDLE_RIGHT_SPRITESET", "IDLE_LEFT_SPRITESET", "IDLE_UP_SPRITESET", "IDLE_DOWN_SPRITESET",
+        "VULNERABLE_SPRITESET", "FLASHING_SPRITESET",
+        "DEFEATED_RIGHT_SPRITESET", "DEFEATED_LEFT_SPRITESET", "DEFEATED_UP_SPRITESET", "DEFEATED_DOWN_SPRITESET"]
+
     # Ghosts have two different speeds for regular and vulnerable mode
     DEFAULT_SPEED = 2
     SLOW_SPEED = 1
     RUN_TO_RESPAWN_SPEED = 2
 
     PAC_MAN_CHASE_DISTANCE = 10
+
+    # Added to the vulnerable sprites while a ghost flashes at the end of a power pellet
+    FLASH_TINT = (160, 160, 0)
     
     # Only red color has been created so far
     def __init__(self, window, spawn_pos, color, patrol_points):
@@ -250,22 +284,34 @@ class Ghost(GameCharacter):
         # Ghost can be in three different states (see below). Defeated state isn't implemented yet
         self.current_state = GhostState.PATROL
         super().__init__(window, spawn_pos)
-        self.current_spriteset = self.IDLE_RIGHT_SPRITESET
+        if (self.window is not None):
+            self.current_spriteset = self.IDLE_RIGHT_SPRITESET
 
-        # Initialise patrol
-        self.patrol_queue = SimpleQueue()
-        for patrol_point in patrol_points:
-            self.patrol_queue.put(patrol_point)
-        
-        self.current_patrol_point = self.patrol_queue.get()
+        # Initialise patrol, the points are visited in a loop
+        self.patrol_points = tuple(patrol_points)
+        self.patrol_index = 0
 
         # Vulnerability effect stack
         self.vulnerability_effect_count = 0
+        self.flashing = False
 
-        # Initialize plan
-        self.plan = SimpleQueue()
+        # Initialize plan: the path to the target and the index of the next point after next_plan_point
+        self.plan = ()
+        self.plan_index = 0
         self.next_plan_point = self.get_current_tile()
+        self.previous_plan_point = self.next_plan_point
+        self.plan_target = None
     
+    def get_snapshot(self):
+        return (super().get_snapshot(), self.current_state, self.patrol_index, self.vulnerability_effect_count,
+            self.flashing, self.plan, self.plan_index, self.next_plan_point, self.previous_plan_point, self.plan_target)
+
+    def restore_snapshot(self, snapshot):
+        (character_snapshot, self.current_state, self.patrol_index, self.vulnerability_effect_count,
+            self.flashing, self.plan, self.plan_index, self.next_plan_point, self.previous_plan_point, 
+            self.plan_target) = snapshot
+        super().restore_snapshot(character_snapshot)
+
     def load_animation_frames(self):
         path = self.get_ghost_animation_frames_path()
         self.load_idle_animation_frames(path)
@@ -287,94 +333,39 @@ class Ghost(GameCharacter):
         return path
 
     # Idle corresponds to ghost's regular state. Additionale, all the directions have different spritesheets 
+    # Spritesets come from the shared asset cache, so ghosts of the same color share the same surfaces
     def load_idle_animation_frames(self, path):
-        self.IDLE_RIGHT_SPRITESET = []
-        self.IDLE_RIGHT_SPRITESET.append(pygame.transform.scale(
-            pygame.image.load(
-                os.path.join(path, "Idle_right_0.png")
-            ), (self.CHARACTER_SPRITE_SIZE[0]*env.Map.SCALING, self.CHARACTER_SPRITE_SIZE[1]*env.Map.SCALING)))
-        self.IDLE_RIGHT_SPRITESET.append(pygame.transform.scale(
-            pygame.image.load(
-                os.path.join(path, "Idle_right_1.png")
-            ), (self.CHARACTER_SPRITE_SIZE[0]*env.Map.SCALING, self.CHARACTER_SPRITE_SIZE[1]*env.Map.SCALING)))
-
-        self.IDLE_LEFT_SPRITESET = []
-        self.IDLE_LEFT_SPRITESET.append(pygame.transform.scale(
-            pygame.image.load(
-                os.path.join(path, "Idle_left_0.png")
-            ), (self.CHARACTER_SPRITE_SIZE[0]*env.Map.SCALING, self.CHARACTER_SPRITE_SIZE[1]*env.Map.SCALING)))
-        self.IDLE_LEFT_SPRITESET.append(pygame.transform.scale(
-            pygame.image.load(
-                os.path.join(path, "Idle_left_1.png")
-            ), (self.CHARACTER_SPRITE_SIZE[0]*env.Map.SCALING, self.CHARACTER_SPRITE_SIZE[1]*env.Map.SCALING)))
-
-        self.IDLE_UP_SPRITESET = []
-        self.IDLE_UP_SPRITESET.append(pygame.transform.scale(
-            pygame.image.load(
-                os.path.join(path, "Idle_up_0.png")
-            ), (self.CHARACTER_SPRITE_SIZE[0]*env.Map.SCALING, self.CHARACTER_SPRITE_SIZE[1]*env.Map.SCALING)))
-        self.IDLE_UP_SPRITESET.append(pygame.transform.scale(
-            pygame.image.load(
-                os.path.join(path, "Idle_up_1.png")
-            ), (self.CHARACTER_SPRITE_SIZE[0]*env.Map.SCALING, self.CHARACTER_SPRITE_SIZE[1]*env.Map.SCALING)))
-
-        self.IDLE_DOWN_SPRITESET = []
-        self.IDLE_DOWN_SPRITESET.append(pygame.transform.scale(
-            pygame.image.load(
-                os.path.join(path, "Idle_down_0.png")
-            ), (self.CHARACTER_SPRITE_SIZE[0]*env.Map.SCALING, self.CHARACTER_SPRITE_SIZE[1]*env.Map.SCALING)))
-        self.IDLE_DOWN_SPRITESET.append(pygame.transform.scale(
-            pygame.image.load(
-                os.path.join(path, "Idle_down_1.png")
-            ), (self.CHARACTER_SPRITE_SIZE[0]*env.Map.SCALING, self.CHARACTER_SPRITE_SIZE[1]*env.Map.SCALING)))
+        self.IDLE_RIGHT_SPRITESET = self.load_spriteset(path, "Idle_right_{}.png", 2)
+        self.IDLE_LEFT_SPRITESET = self.load_spriteset(path, "Idle_left_{}.png", 2)
+        self.IDLE_UP_SPRITESET = self.load_spriteset(path, "Idle_up_{}.png", 2)
+        self.IDLE_DOWN_SPRITESET = self.load_spriteset(path, "Idle_down_{}.png", 2)
 
     def load_vulnerable_animation_frames(self, path):
-        self.VULNERABLE_SPRITESET = []
-
-        self.VULNERABLE_SPRITESET.append(pygame.transform.scale(
-            pygame.image.load(
-                os.path.join(path, "Vulnerable_0.png")
-            ), (self.CHARACTER_SPRITE_SIZE[0]*env.Map.SCALING, self.CHARACTER_SPRITE_SIZE[1]*env.Map.SCALING)))
-        self.VULNERABLE_SPRITESET.append(pygame.transform.scale(
-            pygame.image.load(
-                os.path.join(path, "Vulnerable_1.png")
-            ), (self.CHARACTER_SPRITE_SIZE[0]*env.Map.SCALING, self.CHARACTER_SPRITE_SIZE[1]*env.Map.SCALING)))
+        self.VULNERABLE_SPRITESET = self.load_spriteset(path, "Vulnerable_{}.png", 2)
+        self.FLASHING_SPRITESET = Assets.load_tinted_spriteset(
+            [os.path.join(path, "Vulnerable_{}.png".format(frame)) for frame in range(2)], 
+            self.get_sprite_size(), Ghost.FLASH_TINT)
 
     def load_defeated_animation_frames(self, path):
-        self.DEFEATED_RIGHT_SPRITESET = []
-        self.DEFEATED_RIGHT_SPRITESET.append(pygame.transform.scale(
-            pygame.image.load(
-                os.path.join(path, "Defeated_right.png")
-            ), (self.CHARACTER_SPRITE_SIZE[0]*env.Map.SCALING, self.CHARACTER_SPRITE_SIZE[1]*env.Map.SCALING)))
-
-        self.DEFEATED_LEFT_SPRITESET = []
-        self.DEFEATED_LEFT_SPRITESET.append(pygame.transform.scale(
-            pygame.image.load(
-                os.path.join(path, "Defeated_left.png")
-            ), (self.CHARACTER_SPRITE_SIZE[0]*env.Map.SCALING, self.CHARACTER_SPRITE_SIZE[1]*env.Map.SCALING)))
-
-        self.DEFEATED_UP_SPRITESET = []
-        self.DEFEATED_UP_SPRITESET.append(pygame.transform.scale(
-            pygame.image.load(
-                os.path.join(path, "Defeated_up.png")
-            ), (self.CHARACTER_SPRITE_SIZE[0]*env.Map.SCALING, self.CHARACTER_SPRITE_SIZE[1]*env.Map.SCALING)))
-
-        self.DEFEATED_DOWN_SPRITESET = []
-        self.DEFEATED_DOWN_SPRITESET.append(pygame.transform.scale(
-            pygame.image.load(
-                os.path.join(path, "Defeated_down.png")
-            ), (self.CHARACTER_SPRITE_SIZE[0]*env.Map.SCALING, self.CHARACTER_SPRITE_SIZE[1]*env.Map.SCALING)))
+        self.DEFEATED_RIGHT_SPRITESET = self.load_spriteset(path, "Defeated_right.png", 1)
+        self.DEFEATED_LEFT_SPRITESET = self.load_spriteset(path, "Defeated_left.png", 1)
+        self.DEFEATED_UP_SPRITESET = self.load_spriteset(path, "Defeated_up.png", 1)
+        self.DEFEATED_DOWN_SPRITESET = self.load_spriteset(path, "Defeated_down.png", 1)
+
+    def load_spriteset(self, path, file_name_format, frame_count):
+        return Assets.load_spriteset(
+            [os.path.join(path, file_name_format.format(frame)) for frame in range(frame_count)], 
+            self.get_sprite_size())
 
+    # Catching Pac-Man (eat_pac_man) is checked by the simulation once all the ghosts moved
     def update(self, walls, pac_man):
         self.change_state(pac_man)
         self.execute_states(walls, pac_man)
-        self.animate()
-        self.eat_pac_man(pac_man)
 
     # State machine change state commands
+    # Timed changes (vulnerability, flashing, respawning) are driven by the simulation's scheduler
     def change_state(self, pac_man):
         self.patrol_chase_interchange(pac_man)
-        self.respawn_if_defeated()
 
     def put_on_vulnerability(self):
         if (self.current_state != GhostState.DEFEATED):
@@ -387,6 +378,7 @@ class Ghost(GameCharacter):
 
             if (self.vulnerability_effect_count == 0):
                 self.current_state = GhostState.PATROL   
+                self.flashing = False
     
     def patrol_chase_interchange(self, pac_man):
         if (self.current_state in [GhostState.PATROL, GhostState.CHASE]):
@@ -399,14 +391,27 @@ class Ghost(GameCharacter):
     def defeat(self):
         self.current_state = GhostState.DEFEATED
         self.vulnerability_effect_count = 0
+        self.flashing = False
+
+    def set_flashing(self, flashing):
+        if (self.current_state == GhostState.VULNERABLE):
+            self.flashing = flashing
 
-    def respawn_if_defeated(self):
+    def is_waiting_to_respawn(self):
+        return (self.current_state == GhostState.DEFEATED 
+            and self.body_collider.colliderect(env.Map.GHOST_SPAWN))
+
+    def respawn(self):
         if (self.current_state == GhostState.DEFEATED):
-            if (self.body_collider.colliderect(env.Map.GHOST_SPAWN)):
-                self.current_state = GhostState.PATROL
+            self.current_state = GhostState.PATROL
 
     # State machine execution commands
+    # Every state is profiled as a separate phase (ghost.patrol, ghost.chase...)
     def execute_states(self, walls, pac_man):
+        if (profiler.active is not None):
+            start = perf_counter()
+            state = self.current_state
+
         self.set_speed()
 
         current_pos = self.get_current_tile()
@@ -421,43 +426,85 @@ class Ghost(GameCharacter):
         elif (self.current_state == GhostState.DEFEATED):
             self.go_to_spawn(current_pos, walls)
 
+        if (profiler.active is not None):
+            profiler.active.add("ghost." + state.name.lower(), start)
+
+    # Chasing and running away both use the flow field towards Pac-Man's tile, which all the ghosts share
+    # and which is only recomputed when Pac-Man reaches another tile
     def chase_pac_man(self, pac_man, current_pos, walls):
-        path = env.Map.MAP_GRAPH.get_shortest_path(current_pos, pac_man.get_current_tile())
-        self.move_along_the_path(walls, path)
+        flow_field = Ghost.get_pac_man_flow_field(pac_man)
+        if (flow_field is not None):
+            self.follow_flow_field(flow_field.get_downhill_step(current_pos), current_pos, walls)
     
     def patrol(self, current_pos, walls):
-        if (current_pos == self.current_patrol_point):
-            self.patrol_queue.put(self.current_patrol_point)
-            self.current_patrol_point = self.patrol_queue.get()
+        if (current_pos == self.patrol_points[self.patrol_index]):
+            self.patrol_index = (self.patrol_index + 1) % len(self.patrol_points)
         else:
-            path = env.Map.MAP_GRAPH.get_shortest_path(current_pos, self.current_patrol_point)
-            self.move_along_the_path(walls, path)
+            self.follow_plan(self.patrol_points[self.patrol_index], current_pos, walls)
 
+    # Vulnerable ghosts climb the flow field, to the neighbor farthest from Pac-Man
     def run_away(self, pac_man, current_pos, walls):
-        path_to_pac_man = env.Map.MAP_GRAPH.get_shortest_path(current_pos, pac_man.get_current_tile())
+        flow_field = Ghost.get_pac_man_flow_field(pac_man)
+        if (flow_field is not None):
+            self.follow_flow_field(flow_field.get_uphill_step(current_pos), current_pos, walls)
 
-        if (len(path_to_pac_man) > 1):
-            away_from_move = path_to_pac_man[1]
+    # None while Pac-Man is off the graph (e.g. he slipped out of the tunnel row), ghosts wait for him to come back
+    def get_pac_man_flow_field(pac_man):
+        if (profiler.active is not None):
+            start = perf_counter()
 
-            next_move = Ghost.get_runaway_move(away_from_move, current_pos)
-            self.move_along_the_path(walls, [current_pos, next_move])
+        try:
+            flow_field = env.Map.MAP_GRAPH.get_flow_field(pac_man.get_current_tile())
+        except KeyError:
+            flow_field = None
 
-    def get_runaway_move(away_from_move, current_pos):
-        possible_moves = env.Map.MAP_GRAPH.neighbors(current_pos)
-        safe_moves = [move for move in possible_moves if move != away_from_move]
-        
-        vec = (current_pos[0] - away_from_move[0], current_pos[1] - away_from_move[1])
-        opposite_move = (current_pos[0] + vec[0], current_pos[1] + vec[1])
-        if (opposite_move in safe_moves):
-            return opposite_move
-        else:
-            # Any other safe move
-            return safe_moves[0]
+        if (profiler.active is not None):
+            profiler.active.add("ghost.flow_field", start)
+        return flow_field
+
+    # The plan isn't followed meanwhile, it is made again when the ghost needs one
+    def follow_flow_field(self, next_step, current_pos, walls):
+        self.plan_target = None
+        self.move_along_the_path(walls, [current_pos, next_step])
 
     def go_to_spawn(self, current_pos, walls):
         if (current_pos != env.Map.GHOST_SPAWN_POINT):
-            path = env.Map.MAP_GRAPH.get_shortest_path(current_pos, env.Map.GHOST_SPAWN_POINT)
-            self.move_along_the_path(walls, path)
+            self.follow_plan(env.Map.GHOST_SPAWN_POINT, current_pos, walls)
+
+    # Moves one step along the plan towards the target
+    # The previous path is reused as long as the target hasn't changed and the ghost hasn't left it
+    def follow_plan(self, target, current_pos, walls):
+        self.update_plan(target, current_pos)
+        self.move_along_the_path(walls, [current_pos, self.next_plan_point])
+
+    def update_plan(self, target, current_pos):
+        if (target != self.plan_target 
+            or current_pos not in (self.previous_plan_point, self.next_plan_point)):
+            self.make_plan(target, current_pos)
+        elif (current_pos == self.next_plan_point and self.plan_index < len(self.plan)):
+            self.previous_plan_point = self.next_plan_point
+            self.next_plan_point = self.plan[self.plan_index]
+            self.plan_index += 1
+
+    def make_plan(self, target, current_pos):
+        if (profiler.active is not None):
+            start = perf_counter()
+
+        try:
+            path = env.Map.MAP_GRAPH.get_shortest_path(current_pos, target)
+        except KeyError:
+            # The target is off the graph (e.g. Pac-Man slipped out of the tunnel row), wait for it to come back
+            path = [current_pos]
+
+        if (profiler.active is not None):
+            profiler.active.add("ghost.path_search", start)
+
+        self.plan = tuple(path)
+        self.plan_index = 2
+
+        self.plan_target = target
+        self.previous_plan_point = current_pos
+        self.next_plan_point = path[1] if len(path) > 1 else current_pos
 
     # Ghosts are slow only in vulnerable state
     def set_speed(self):
@@ -488,7 +535,10 @@ class Ghost(GameCharacter):
     def set_spriteset(self):
         new_spriteset = []
         if (self.current_state == GhostState.VULNERABLE):
-            new_spriteset = self.VULNERABLE_SPRITESET
+            if (self.flashing):
+                new_spriteset = self.FLASHING_SPRITESET
+            else:
+                new_spriteset = self.VULNERABLE_SPRITESET
         elif (self.current_state == GhostState.DEFEATED):
             if (self.direction == Direction.RIGHT):
                 new_spriteset = self.DEFEATED_RIGHT_SPRITESET
@@ -515,10 +565,10 @@ class Ghost(GameCharacter):
     def get_current_sprite(self):
         return self.current_spriteset[self.current_frame]
 
-    def eat_pac_man(self, pac_man):
+    def eat_pac_man(self, pac_man, events):
         if (self.current_state == GhostState.CHASE):
             if self.eat_collider.colliderect(pac_man.body_collider):
-                pygame.event.post(pygame.event.Event(ue.UserEvents.GAME_OVER))
+                events.append(ue.UserEvents.GAME_OVER)
         
 class GhostState(Enum):
     PATROL = 0
@@ -0,0 +1,296 @@
+from collections import deque, OrderedDict
+from heapq import heappush, heappop
+
+
+# Hierarchical path search (HPA*) over a MapGraph, for mazes too big for the path table or a full A* per query
+# The maze is cut into square clusters. Where a border between two clusters can be crossed, a few crossing
+# points (entrances) are picked and the distances between the entrances of every cluster are searched once,
+# inside the cluster. A query searches that small graph of entrances (the abstract graph) and then turns every
+# step between two entrances back into tiles, with a search that never leaves one cluster (refinement)
+# Paths only cross borders at entrances, so where a border can be crossed over a long run of tiles
+# they can be longer than the shortest ones. Paths up to two clusters long, where a detour matters most
+# (a ghost chasing Pac-Man), are searched again with a flat A* whenever they could be shorter (see shorten_path)
+# In mazes of one tile wide corridors every crossing is an entrance and all the paths are the shortest,
+# on open maps long paths can be up to about a third longer (see benchmarks/large_maze.py)
+class ClusterGraph:
+    DEFAULT_CLUSTER_SIZE = 16
+
+    # A border that can be crossed over at least this many tiles in a row gets an entrance at both ends
+    # of the run instead of one in the middle
+    LONG_ENTRANCE_LENGTH = 6
+
+    # Most recently used paths kept for repeated queries, e.g. a ghost asking again after one step
+    PATH_CACHE_SIZE = 4096
+    SEGMENT_CACHE_SIZE = 16384
+
+    def __init__(self, map_graph, cluster_size=DEFAULT_CLUSTER_SIZE):
+        self.map_graph = map_graph
+        self.cluster_size = cluster_size
+
+        # Entrance -> [(entrance, cost)...], the edges between entrances
+        self.abstract_graph = {}
+
+        # Cluster -> entrances in it
+        self.cluster_entrances = {}
+
+        # (start, finish) -> path, for whole queries and for the refined steps between two entrances
+        self.path_cache = OrderedDict()
+        self.segment_cache = OrderedDict()
+
+        # Search statistics
+        self.search_count = 0
+        self.expansion_count = 0
+        self.cache_hits = 0
+
+        self.add_entrances()
+        self.connect_entrances()
+
+    def get_cluster(self, point):
+        return (point[0] // self.cluster_size, point[1] // self.cluster_size)
+
+    def get_entrance_count(self):
+        return len(self.abstract_graph)
+
+    # Groups the graph edges that cross a cluster border into runs of parallel edges next to each other,
+    # and turns every run into one or two entrances
+    def add_entrances(self):
+        borders = {}
+        for point, neighbors in self.map_graph.graph.items():
+            cluster = self.get_cluster(point)
+            for neighbor in neighbors:
+                neighbor_cluster = self.get_cluster(neighbor)
+                if (neighbor_cluster == cluster or neighbor < point):
+                    continue
+
+                # Edges crossing the same border side by side only differ in the coordinate along the border
+                if (point[1] == neighbor[1]):
+                    key = (cluster, neighbor_cluster, 0, point[0], neighbor[0])
+                    position = point[1]
+                else:
+                    key = (cluster, neighbor_cluster, 1, point[1], neighbor[1])
+                    position = point[0]
+                borders.setdefault(key, []).append((position, point, neighbor))
+
+        for crossings in borders.values():
+            crossings.sort()
+            run = [crossings[0]]
+            for crossing in crossings[1:]:
+                if (crossing[0] != run[-1][0] + 1):
+                    self.add_entrance_run(run)
+                    run = []
+                run.append(crossing)
+            self.add_entrance_run(run)
+
+    def add_entrance_run(self, run):
+        if (len(run) >= ClusterGraph.LONG_ENTRANCE_LENGTH):
+            crossings = [run[0], run[-1]]
+        else:
+            crossings = [run[len(run) // 2]]
+
+        for position, point, neighbor in crossings:
+            self.add_entrance(point)
+            self.add_entrance(neighbor)
+            self.abstract_graph[point].append((neighbor, 1))
+            self.abstract_graph[neighbor].append((point, 1))
+
+    def add_entrance(self, point):
+        if (point not in self.abstract_graph):
+            self.abstract_graph[point] = []
+            self.cluster_entrances.setdefault(self.get_cluster(point), []).append(point)
+
+    # Links every pair of entrances of a cluster that can reach each other without leaving it
+    def connect_entrances(self):
+        for entrances in self.cluster_entrances.values():
+            for entrance in entrances:
+                distances, _ = self.search_cluster(entrance)
+                for other in entrances:
+                    if (other != entrance and other in distances):
+                        self.abstract_graph[entrance].append((other, distances[other]))
+
+    # BFS from start that never leaves its cluster
+    # Returns the distance to and the previous point of every point reached, stops early once finish is reached
+    def search_cluster(self, start, finish=None):
+        cluster_size = self.cluster_size
+        cluster_x = start[0] // cluster_size
+        cluster_y = start[1] // cluster_size
+        graph = self.map_graph.graph
+
+        distances = {start: 0}
+        came_from = {start: None}
+        frontier = deque([start])
+        while frontier:
+            current = frontier.popleft()
+            if (current == finish):
+                break
+
+            new_distance = distances[current] + 1
+            for next_point in graph[current]:
+                if (next_point not in distances and next_point[0] // cluster_size == cluster_x
+                    and next_point[1] // cluster_size == cluster_y):
+                    distances[next_point] = new_distance
+                    came_from[next_point] = current
+                    frontier.append(next_point)
+
+        return distances, came_from
+
+    # Raises KeyError if a point isn't on the graph or the finish can't be reached, like MapGraph.get_shortest_path
+    def get_shortest_path(self, start, finish):
+        if (start not in self.map_graph.graph):
+            raise KeyError(start)
+        if (finish not in self.map_graph.graph):
+            raise KeyError(finish)
+
+        key = (start, finish)
+        if (key in self.path_cache):
+            self.cache_hits += 1
+            self.path_cache.move_to_end(key)
+            return list(self.path_cache[key])
+
+        path = self.build_shortest_path(start, finish)
+
+        self.path_cache[key] = tuple(path)
+        if (len(self.path_cache) > ClusterGraph.PATH_CACHE_SIZE):
+            self.path_cache.popitem(last=False)
+        return path
+
+    def build_shortest_path(self, start, finish):
+        self.search_count += 1
+        short_length = 2 * self.cluster_size
+
+        # The search of the start's cluster stops once it reaches the finish, otherwise it covers the whole cluster
+        start_distances, start_came_from = self.search_cluster(start, finish)
+        if (finish in start_distances):
+            if (start_distances[finish] <= short_length):
+                return self.shorten_path(start, finish, ClusterGraph.trace_path(start_came_from, finish))
+            start_distances, start_came_from = self.search_cluster(start)
+
+        path = self.build_hierarchical_path(start, finish, start_distances, start_came_from)
+        if (len(path) - 1 <= short_length):
+            path = self.shorten_path(start, finish, path)
+        return path
+
+    # Short paths, where a detour matters most, are searched again with a flat A* if they could be shorter.
+    # A* only looks at the points closer than the path it has to beat, so the search stays small
+    def shorten_path(self, start, finish, path):
+        if (len(path) - 1 > self.map_graph.estimate_distance(start, finish)):
+            came_from = self.map_graph.build_shortest_path(start, finish)
+            return ClusterGraph.trace_path(came_from, finish)
+        return path
+
+    # start_distances and start_came_from are the search of the start's whole cluster
+    def build_hierarchical_path(self, start, finish, start_distances, start_came_from):
+        finish_distances, finish_came_from = self.search_cluster(finish)
+
+        # A finish in the start's cluster can be reached without leaving it, but a way out of the cluster
+        # and back in can still be shorter, so the local path only bounds the search over the entrances
+        local_distance = start_distances.get(finish)
+        entrances = self.search_abstract_graph(start, finish, start_distances, finish_distances, local_distance)
+        if (entrances is None):
+            if (local_distance is None):
+                raise KeyError(finish)
+            return ClusterGraph.trace_path(start_came_from, finish)
+
+        # From the start to the first entrance, between the entrances, and from the last entrance to the finish
+        path = ClusterGraph.trace_path(start_came_from, entrances[0])
+        for entrance, next_entrance in zip(entrances, entrances[1:]):
+            path.extend(self.refine(entrance, next_entrance)[1:])
+
+        # The search from the finish leads back to it
+        current = finish_came_from[entrances[-1]]
+        while (current is not None):
+            path.append(current)
+            current = finish_came_from[current]
+
+        return path
+
+    # A* over the entrances, starting from those the start reaches in its own cluster
+    # and ending at those the finish is reached from in its cluster
+    # Returns the entrances passed on the way, or None if the finish can't be reached
+    # With best_cost set, only a way shorter than best_cost is looked for, None means there is none
+    def search_abstract_graph(self, start, finish, start_distances, finish_distances, best_cost=None):
+        exits = {entrance: finish_distances[entrance]
+            for entrance in self.cluster_entrances.get(self.get_cluster(finish), []) if entrance in finish_distances}
+
+        # MapGraph.estimate_distance, inlined: it is the bulk of the work on large mazes
+        width = self.map_graph.width
+        height = self.map_graph.height
+        finish_x, finish_y = finish
+
+        # Entries are (f-cost, cost so far, entrance), entries left behind by a cheaper way to the entrance are skipped
+        frontier = []
+        cost_so_far = {}
+        came_from = {}
+        for entrance in self.cluster_entrances.get(self.get_cluster(start), []):
+            if (entrance in start_distances):
+                cost_so_far[entrance] = start_distances[entrance]
+                came_from[entrance] = None
+                heappush(frontier, (cost_so_far[entrance] + self.map_graph.estimate_distance(entrance, finish),
+                    cost_so_far[entrance], entrance))
+
+        best_exit = None
+        abstract_graph = self.abstract_graph
+        while frontier:
+            priority, cost, current = heappop(frontier)
+            if (best_cost is not None and priority >= best_cost):
+                break
+            if (cost > cost_so_far[current]):
+                continue
+
+            self.expansion_count += 1
+            if (current in exits and (best_cost is None or cost + exits[current] < best_cost)):
+                best_exit = current
+                best_cost = cost + exits[current]
+
+            for next_entrance, step_cost in abstract_graph[current]:
+                new_cost = cost + step_cost
+                if (new_cost < cost_so_far.get(next_entrance, new_cost + 1)):
+                    cost_so_far[next_entrance] = new_cost
+                    came_from[next_entrance] = current
+
+                    distance_x = abs(next_entrance[0] - finish_x)
+                    distance_y = abs(next_entrance[1] - finish_y)
+                    if (width is not None):
+                        if (width - distance_x < distance_x):
+                            distance_x = width - distance_x
+                        if (height - distance_y < distance_y):
+                            distance_y = height - distance_y
+                    heappush(frontier, (new_cost + distance_x + distance_y, new_cost, next_entrance))
+
+        if (best_exit is None):
+            return None
+
+        entrances = [best_exit]
+        while (came_from[entrances[-1]] is not None):
+            entrances.append(came_from[entrances[-1]])
+        entrances.reverse()
+        return entrances
+
+    # The tiles between two entrances linked in the abstract graph: either the two sides of a border crossing,
+    # or two entrances of the same cluster, searched without leaving it
+    def refine(self, entrance, next_entrance):
+        if (self.get_cluster(entrance) != self.get_cluster(next_entrance)):
+            return [entrance, next_entrance]
+
+        key = (entrance, next_entrance)
+        if (key in self.segment_cache):
+            self.segment_cache.move_to_end(key)
+            return self.segment_cache[key]
+
+        _, came_from = self.search_cluster(entrance, next_entrance)
+        segment = ClusterGraph.trace_path(came_from, next_entrance)
+
+        self.segment_cache[key] = segment
+        if (len(self.segment_cache) > ClusterGraph.SEGMENT_CACHE_SIZE):
+            self.segment_cache.popitem(last=False)
+        return segment
+
+    def trace_path(came_from, finish):
+        path = [finish]
+        while (came_from[path[-1]] is not None):
+            path.append(came_from[path[-1]])
+        path.reverse()
+        return path
+
+    def clear_caches(self):
+        self.path_cache.clear()
+        self.segment_cache.clear()
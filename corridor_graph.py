@@ -0,0 +1,173 @@
+from heapq import heappush, heappop
+
+
+# MapGraph compressed to its junctions: most tiles of a maze are corridor tiles with exactly two neighbors,
+# where there is nothing to decide. The nodes of the corridor graph are the other tiles (junctions and dead ends),
+# linked by corridors weighted by their length, so a search only looks at the places where paths can fork
+# Corridors are (one end, other end, tiles between them from the first end to the other)
+class CorridorGraph:
+    def __init__(self, map_graph):
+        self.map_graph = map_graph
+
+        # Node -> [(node, length, corridor index, True if the corridor is walked from its first end)...]
+        self.nodes = {}
+        self.corridors = []
+
+        # Corridor tile -> (corridor index, position in the corridor's tiles)
+        self.corridor_tiles = {}
+
+        # Search statistics
+        self.search_count = 0
+        self.expansion_count = 0
+
+        for point, neighbors in map_graph.graph.items():
+            if (len(neighbors) != 2):
+                self.nodes[point] = []
+        for node in list(self.nodes):
+            self.add_corridors(node)
+
+        # Loops without any junction on them get one of their tiles as a node
+        for point in map_graph.graph:
+            if (point not in self.nodes and point not in self.corridor_tiles):
+                self.nodes[point] = []
+                self.add_corridors(point)
+
+    def add_corridors(self, node):
+        for neighbor in self.map_graph.neighbors(node):
+            if (neighbor in self.corridor_tiles or self.is_linked(node, neighbor)):
+                continue
+
+            tiles = []
+            previous = node
+            current = neighbor
+            while (current not in self.nodes):
+                tiles.append(current)
+                first, second = self.map_graph.neighbors(current)
+                previous, current = current, (second if first == previous else first)
+
+            index = len(self.corridors)
+            self.corridors.append((node, current, tiles))
+            for position, tile in enumerate(tiles):
+                self.corridor_tiles[tile] = (index, position)
+            self.nodes[node].append((current, len(tiles) + 1, index, True))
+            if (current != node):
+                self.nodes[current].append((node, len(tiles) + 1, index, False))
+
+    # Two nodes next to each other are linked by a corridor without tiles, only one is made for both of them
+    def is_linked(self, node, neighbor):
+        return any(other == neighbor and length == 1 for other, length, index, forward in self.nodes[node])
+
+    def is_node(self, point):
+        return point in self.nodes
+
+    # The corridor a tile is on and its position in it, None for nodes
+    def get_corridor(self, point):
+        return self.corridor_tiles.get(point)
+
+    # Tiles walked along a corridor from one of its ends, not counting the ends
+    def get_corridor_tiles(self, index, forward):
+        tiles = self.corridors[index][2]
+        return tiles if forward else tiles[::-1]
+
+    # Nodes a point reaches first in every direction, as (node, distance, tiles walked on the way there)
+    def get_exits(self, point):
+        if (point in self.nodes):
+            return [(point, 0, [])]
+
+        index, position = self.corridor_tiles[point]
+        first_end, second_end, tiles = self.corridors[index]
+        return [(first_end, position + 1, tiles[position - 1::-1] if position > 0 else []),
+            (second_end, len(tiles) - position, tiles[position + 1:])]
+
+    # A* over the nodes, from the nodes at the ends of the start's corridor to those of the finish's corridor
+    # Raises KeyError if a point isn't on the graph or the finish can't be reached, like MapGraph.get_shortest_path
+    def get_shortest_path(self, start, finish):
+        if (start not in self.map_graph.graph):
+            raise KeyError(start)
+        if (finish not in self.map_graph.graph):
+            raise KeyError(finish)
+
+        if (start == finish):
+            return [start]
+
+        self.search_count += 1
+        estimate_distance = self.map_graph.estimate_distance
+
+        # Node -> (distance from it to the finish, tiles walked from the finish to it)
+        # Both ends of a corridor can be the same node (a loop), the shorter way counts
+        exits = {}
+        for node, distance, tiles in self.get_exits(finish):
+            if (node not in exits or distance < exits[node][0]):
+                exits[node] = (distance, tiles)
+
+        # Start and finish on the same corridor can reach each other without passing a node
+        best_cost = None
+        best_path = None
+        start_corridor = self.corridor_tiles.get(start)
+        finish_corridor = self.corridor_tiles.get(finish)
+        if (start_corridor is not None and finish_corridor is not None and start_corridor[0] == finish_corridor[0]):
+            tiles = self.corridors[start_corridor[0]][2]
+            start_position = start_corridor[1]
+            finish_position = finish_corridor[1]
+            best_cost = abs(finish_position - start_position)
+            if (start_position < finish_position):
+                best_path = tiles[start_position:finish_position + 1]
+            else:
+                best_path = tiles[finish_position:start_position + 1][::-1]
+
+        frontier = []
+        cost_so_far = {}
+
+        # Node -> (previous node, corridor index, direction) or, for the nodes next to the start, (None, tiles walked)
+        came_from = {}
+        for node, distance, tiles in self.get_exits(start):
+            if (node not in cost_so_far or distance < cost_so_far[node]):
+                cost_so_far[node] = distance
+                came_from[node] = (None, tiles)
+                heappush(frontier, (distance + estimate_distance(node, finish), distance, node))
+
+        best_exit = None
+        while frontier:
+            priority, cost, current = heappop(frontier)
+            if (best_cost is not None and priority >= best_cost):
+                break
+            if (cost > cost_so_far[current]):
+                continue
+
+            self.expansion_count += 1
+            if (current in exits and (best_cost is None or cost + exits[current][0] < best_cost)):
+                best_exit = current
+                best_cost = cost + exits[current][0]
+
+            for next_node, length, index, forward in self.nodes[current]:
+                new_cost = cost + length
+                if (next_node not in cost_so_far or new_cost < cost_so_far[next_node]):
+                    cost_so_far[next_node] = new_cost
+                    came_from[next_node] = (current, index, forward)
+                    heappush(frontier, (new_cost + estimate_distance(next_node, finish), new_cost, next_node))
+
+        if (best_exit is None):
+            if (best_path is None):
+                raise KeyError(finish)
+            return list(best_path)
+
+        # From the finish back to the start, node by node
+        reverse_path = [finish] + exits[best_exit][1]
+        current = best_exit
+        while True:
+            if (current != finish):
+                reverse_path.append(current)
+
+            link = came_from[current]
+            if (link[0] is None):
+                reverse_path.extend(link[1][::-1])
+                break
+
+            previous, index, forward = link
+            reverse_path.extend(self.get_corridor_tiles(index, not forward))
+            current = previous
+
+        if (reverse_path[-1] != start):
+            reverse_path.append(start)
+        reverse_path.reverse()
+        return reverse_path
@@ -1,6 +1,11 @@
 import pygame
 import os
+import threading
+from math import gcd
+from time import perf_counter
 
+from assets import Assets
+from level import Level
 from map_graph import MapGraph
 
 # Basic information about the map
@@ -9,323 +14,399 @@ class Map:
     FIELD_OFFSET = 8
     MAP_WIDTH = 224
     MAP_HEIGHT = 248 + FIELD_OFFSET
-    MAP_TEXTURE = pygame.image.load(os.path.join("Assets/Map", "BG.png"))
     TILE_SIZE = 8
 
-    # Font info
-    pygame.font.init()
-    MAIN_FONT = pygame.font.Font(os.path.join("Assets", "C64_Pro_Mono-STYLE.ttf"), 8*SCALING)
-
-    MAP_GRAPH = MapGraph.FromMapString("""XXXXXXXXXXXXXXXXXXXXXXXXXXXX
-XOOOOOOOOOOOOXXOOOOOOOOOOOOX
-XOXXXXOXXXXXOXXOXXXXXOXXXXOX
-XOXXXXOXXXXXOXXOXXXXXOXXXXOX
-XOXXXXOXXXXXOXXOXXXXXOXXXXOX
-XOOOOOOOOOOOOOOOOOOOOOOOOOOX
-XOXXXXOXXOXXXXXXXXOXXOXXXXOX
-XOXXXXOXXOXXXXXXXXOXXOXXXXOX
-XOOOOOOXXOOOOXXOOOOXXOOOOOOX
-XXXXXXOXXXXXOXXOXXXXXOXXXXXX
-XXXXXXOXXXXXOXXOXXXXXOXXXXXX
-XXXXXXOXXOOOOOOOOOOXXOXXXXXX
-XXXXXXOXXOXXXXXXXXOXXOXXXXXX
-XXXXXXOXXOXXXXXXXXOXXOXXXXXX
-OOOOOOOOOOXXXXXXXXOOOOOOOOOO
-XXXXXXOXXOXXXXXXXXOXXOXXXXXX
-XXXXXXOXXOXXXXXXXXOXXOXXXXXX
-XXXXXXOXXOOOOOOOOOOXXOXXXXXX
-XXXXXXOXXOXXXXXXXXOXXOXXXXXX
-XXXXXXOXXOXXXXXXXXOXXOXXXXXX
-XOOOOOOOOOOOOXXOOOOOOOOOOOOX
-XOXXXXOXXXXXOXXOXXXXXOXXXXOX
-XOXXXXOXXXXXOXXOXXXXXOXXXXOX
-XOOOXXOOOOOOOOOOOOOOOOXXOOOX
-XXXOXXOXXOXXXXXXXXOXXOXXOXXX
-XXXOXXOXXOXXXXXXXXOXXOXXOXXX
-XOOOOOOXXOOOOXXOOOOXXOOOOOOX
-XOXXXXXXXXXXOXXOXXXXXXXXXXOX
-XOXXXXXXXXXXOXXOXXXXXXXXXXOX
-XOOOOOOOOOOOOOOOOOOOOOOOOOOX
-XXXXXXXXXXXXXXXXXXXXXXXXXXXX""")
-    GHOST_SPAWN_POINT = (13, 11)
+    # The texture and the font are only needed for drawing, see load_resources()
+    MAP_TEXTURE = None
+    MAIN_FONT = None
+    FONT_PATH = os.path.join("Assets", "C64_Pro_Mono-STYLE.ttf")
+
+    # The maze, the pellets and the spawn points are all described by the level file (see level.py)
+    LEVEL_SOURCE = os.path.join("Assets/Levels", "level_1.txt")
+    LEVEL_CACHE = os.path.join("Assets/Levels", "level_1.lvl")
+    LEVEL = Level.load_or_compile(LEVEL_SOURCE, LEVEL_CACHE)
+
+    MAP_STRING = LEVEL.get_map_string()
+    MAP_GRAPH = MapGraph.FromMapString(MAP_STRING)
+
+    # Distances and first steps between every two tiles are computed once and cached on disk between runs
+    USE_PATH_TABLE = True
+    PATH_TABLE_CACHE = os.path.join("Assets/Map", "path_table.bin")
+    if (USE_PATH_TABLE):
+        MAP_GRAPH.load_or_build_path_table(PATH_TABLE_CACHE)
+
+    GHOST_SPAWN_POINT = LEVEL.ghost_house
     GHOST_SPAWN = pygame.Rect(GHOST_SPAWN_POINT[0]*TILE_SIZE*SCALING, 
         (GHOST_SPAWN_POINT[1]*TILE_SIZE + FIELD_OFFSET)*SCALING,
         TILE_SIZE*SCALING, TILE_SIZE*SCALING)
 
-# Abstract class for pellets
-class Pellet:
-    def __init__(self, window, position):
-        self.x = position[0] * Map.SCALING
-        self.y = position[1] * Map.SCALING
-        self.window = window
-        
-        self.load_sprite()
+    def load_resources():
+        Map.MAP_TEXTURE = Assets.load_image(os.path.join("Assets/Map", "BG.png"))
 
-        self.collider = pygame.Rect(position[0]*Map.SCALING, position[1]*Map.SCALING, self.sprite.get_width(), self.sprite.get_height())
+        pygame.font.init()
+        Map.MAIN_FONT = pygame.font.Font(Map.FONT_PATH, 8*Map.SCALING)
 
-    def load_sprite(self):
-        self.sprite = pygame.transform.scale(self.SPRITE_TEXTURE, 
-            (self.SPRITE_TEXTURE.get_width()*Map.SCALING, self.SPRITE_TEXTURE.get_height()*Map.SCALING))
+    # The area of the window covered by the tiles at most radius tiles away from the tile (a square around it)
+    def get_tile_area(tile, radius=0):
+        tile_size = Map.TILE_SIZE * Map.SCALING
+        return pygame.Rect((tile[0] - radius) * tile_size, (tile[1] - radius) * tile_size + Map.FIELD_OFFSET * Map.SCALING,
+            (2*radius + 1) * tile_size, (2*radius + 1) * tile_size)
 
-    def draw(self):
-        self.window.blit(self.sprite, (self.collider.x, self.collider.y))
+# Kinds of pellets. Pellets themselves are only bits in Pellets, these hold what is common to all of a kind
+class Pellet:
+    # All pellets of a kind share one scaled sprite
+    def load_sprite(pellet_class):
+        return Assets.load_scaled_image(pellet_class.SPRITE_PATH, Map.SCALING)
 class RegularPellet(Pellet):
-    SPRITE_TEXTURE = pygame.image.load(os.path.join("Assets/Map", "SmallPellet.png"))
+    SPRITE_SIZE = (2, 2)
+    SPRITE_PATH = os.path.join("Assets/Map", "SmallPellet.png")
+    TILE_TYPE = Level.PELLET
 class SuperPellet(Pellet):
-    SPRITE_TEXTURE = pygame.image.load(os.path.join("Assets/Map", "BigPellet.png"))
+    SPRITE_SIZE = (8, 8)
+    SPRITE_PATH = os.path.join("Assets/Map", "BigPellet.png")
+    TILE_TYPE = Level.SUPER_PELLET
+
+# Answers "does this rectangle touch a wall" with a few lookups instead of testing every wall collider
+# The map is split into cells as big as the largest common divisor of all the wall coordinates,
+# so every cell is either fully inside a wall or fully free and the answer is exact.
+# A summed-area table over the cells gives the number of wall cells in any block of cells in 4 lookups
+class CollisionGrid:
+    def __init__(self, colliders, width, height):
+        self.cell_size = 0
+        for collider in colliders:
+            for value in (collider.x, collider.y, collider.width, collider.height):
+                self.cell_size = gcd(self.cell_size, value)
+        self.cell_size = max(self.cell_size, 1)
+
+        self.columns = -(-width // self.cell_size)
+        self.rows = -(-height // self.cell_size)
+
+        # Occupancy bitmap, one byte per cell
+        self.cells = bytearray(self.columns * self.rows)
+        for collider in colliders:
+            for row in range(max(collider.top // self.cell_size, 0), min(collider.bottom // self.cell_size, self.rows)):
+                for column in range(max(collider.left // self.cell_size, 0), min(collider.right // self.cell_size, self.columns)):
+                    self.cells[row * self.columns + column] = 1
+
+        # sums[row * (columns + 1) + column] is the number of wall cells above and to the left of (column, row)
+        self.stride = self.columns + 1
+        self.sums = [0] * (self.stride * (self.rows + 1))
+        stride = self.stride
+        for row in range(self.rows):
+            row_sum = 0
+            for column in range(self.columns):
+                row_sum += self.cells[row * self.columns + column]
+                self.sums[(row + 1) * stride + column + 1] = self.sums[row * stride + column + 1] + row_sum
+
+    def collides(self, rect):
+        x, y, width, height = rect
+        if (width <= 0 or height <= 0):
+            return False
+
+        # Range of cells touched by the rectangle, clipped to the map (there are no walls outside of it)
+        cell_size = self.cell_size
+        first_column = max(x // cell_size, 0)
+        last_column = min((x + width - 1) // cell_size, self.columns - 1)
+        first_row = max(y // cell_size, 0)
+        last_row = min((y + height - 1) // cell_size, self.rows - 1)
+
+        if (first_column > last_column or first_row > last_row):
+            return False
+
+        stride = self.stride
+        sums = self.sums
+        wall_cells = (sums[(last_row + 1) * stride + last_column + 1] - sums[first_row * stride + last_column + 1]
+            - sums[(last_row + 1) * stride + first_column] + sums[first_row * stride + first_column])
+        return wall_cells > 0
+
+# Uniform grid over rectangles that move, e.g. the colliders of the ghosts
+# Every item is listed in the cell that holds the top left corner of its rectangle, and no rectangle is bigger
+# than a cell, so what overlaps a rectangle can only be listed in the cells under it or one cell up or left of them.
+# Queries look at those few cells however many items there are, and test the rectangles of a cell in one pygame call
+# The rectangles are kept by reference: after they move, update() has to be called before the next query,
+# it only touches the grid for the items that moved into another cell
+class SpatialHash:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+
+        # (column, row) -> ([items in the cell], [their rectangles])
+        self.cells = {}
+
+        # Item -> [rectangle, (column, row) of the cell it is listed in]
+        self.entries = {}
+
+    # Adds the item or moves it to where its rectangle is now
+    def update(self, item, rect):
+        cell = (rect.x // self.cell_size, rect.y // self.cell_size)
+        entry = self.entries.get(item)
+        if (entry is None):
+            self.entries[item] = [rect, cell]
+        elif (entry[0] is not rect):
+            self.unlist(item, entry[1])
+            entry[0] = rect
+            entry[1] = cell
+        elif (entry[1] == cell):
+            return
+        else:
+            self.unlist(item, entry[1])
+            entry[1] = cell
+
+        items, rects = self.cells.setdefault(cell, ([], []))
+        items.append(item)
+        rects.append(rect)
+
+    def remove(self, item):
+        self.unlist(item, self.entries.pop(item)[1])
+
+    def unlist(self, item, cell):
+        items, rects = self.cells[cell]
+        index = items.index(item)
+        del items[index]
+        del rects[index]
+        if (not items):
+            del self.cells[cell]
+
+    # Items whose rectangle overlaps the rectangle, in no particular order
+    def find_overlapping(self, rect):
+        cell_size = self.cell_size
+        cells = self.cells
+        found = []
+        for row in range((rect.y - cell_size + 1) // cell_size, (rect.bottom - 1) // cell_size + 1):
+            for column in range((rect.x - cell_size + 1) // cell_size, (rect.right - 1) // cell_size + 1):
+                cell = cells.get((column, row))
+                if (cell is not None):
+                    items = cell[0]
+                    for index in rect.collidelistall(cell[1]):
+                        found.append(items[index])
+        return found
 
 # Contains invisible rectangle collider objects that correspond to the walls drawn on the map
+# The colliders are derived from the level's tiles (see Level.build_wall_rects)
 class Walls:
-    wall_colliders = []
+    # Walls never change, so all the games running in the process can share them (see get_shared())
+    shared = {}
 
     def __init__(self, vert_offset):
+        self.wall_colliders = []
+
         scaling = Map.SCALING
-        #Outer walls
-            #Top part
-        self.wall_colliders.append(pygame.Rect(0, scaling*vert_offset, 
-        scaling*4, scaling*76))
-        self.wall_colliders.append(pygame.Rect(0, scaling*vert_offset, 
-        scaling*224, scaling*4))
-        self.wall_colliders.append(pygame.Rect(scaling*108, scaling*vert_offset, 
-        scaling*8, scaling*36))
-        self.wall_colliders.append(pygame.Rect(scaling*220, scaling*vert_offset, 
-        scaling*4, scaling*76))
-        self.wall_colliders.append(pygame.Rect(0, scaling*(vert_offset + 76), 
-        scaling*44, scaling*32))
-        self.wall_colliders.append(pygame.Rect(scaling*180, scaling*(vert_offset + 76), 
-        scaling*44, scaling*32))
-
-            #Bottom part
-        self.wall_colliders.append(pygame.Rect(0, scaling*(248 + vert_offset - 92), 
-        scaling*4, scaling*92))
-        self.wall_colliders.append(pygame.Rect(0, scaling*(248 + vert_offset - 4), 
-        scaling*224, scaling*4))
-        self.wall_colliders.append(pygame.Rect(scaling*220, scaling*(248 + vert_offset - 92), 
-        scaling*4, scaling*92))
-        self.wall_colliders.append(pygame.Rect(0, scaling*(vert_offset + 124), 
-        scaling*44, scaling*32))
-        self.wall_colliders.append(pygame.Rect(scaling*180, scaling*(vert_offset + 124), 
-        scaling*44, scaling*32))
-        self.wall_colliders.append(pygame.Rect(scaling*4, scaling*(vert_offset + 196), 
-        scaling*16, scaling*8))
-        self.wall_colliders.append(pygame.Rect(scaling*(224 - 16 - 4), scaling*(vert_offset + 196), 
-        scaling*16, scaling*8))
-
-        #Top blocks
-            
-        self.wall_colliders.append(pygame.Rect(scaling*20, scaling*(vert_offset + 20), 
-        scaling*24, scaling*16))
-        self.wall_colliders.append(pygame.Rect(scaling*60, scaling*(vert_offset + 20), 
-        scaling*32, scaling*16))
-        self.wall_colliders.append(pygame.Rect(scaling*132, scaling*(vert_offset + 20), 
-        scaling*32, scaling*16))
-        self.wall_colliders.append(pygame.Rect(scaling*180, scaling*(vert_offset + 20), 
-        scaling*24, scaling*16))
-        self.wall_colliders.append(pygame.Rect(scaling*20, scaling*(vert_offset + 52), 
-        scaling*24, scaling*8))
-        self.wall_colliders.append(pygame.Rect(scaling*180, scaling*(vert_offset + 52), 
-        scaling*24, scaling*8))
-
-        #Top Ts
-        self.wall_colliders.append(pygame.Rect(scaling*60, scaling*(vert_offset + 52), 
-        scaling*8, scaling*56))
-        self.wall_colliders.append(pygame.Rect(scaling*68, scaling*(vert_offset + 76), 
-        scaling*24, scaling*8))
-        self.wall_colliders.append(pygame.Rect(scaling*156, scaling*(vert_offset + 52), 
-        scaling*8, scaling*56))
-        self.wall_colliders.append(pygame.Rect(scaling*132, scaling*(vert_offset + 76), 
-        scaling*24, scaling*8))
-        self.wall_colliders.append(pygame.Rect(scaling*84, scaling*(vert_offset + 52), 
-        scaling*56, scaling*8))
-        self.wall_colliders.append(pygame.Rect(scaling*108, scaling*(vert_offset + 60), 
-        scaling*8, scaling*24))
-
-        #Bottom blocks
-        self.wall_colliders.append(pygame.Rect(scaling*60, scaling*(vert_offset + 124), 
-        scaling*8, scaling*32))
-        self.wall_colliders.append(pygame.Rect(scaling*156, scaling*(vert_offset + 124), 
-        scaling*8, scaling*32))
-        self.wall_colliders.append(pygame.Rect(scaling*60, scaling*(vert_offset + 172), 
-        scaling*32, scaling*8))
-        self.wall_colliders.append(pygame.Rect(scaling*132, scaling*(vert_offset + 172), 
-        scaling*32, scaling*8))
-
-        #Bottom turns
-        self.wall_colliders.append(pygame.Rect(scaling*20, scaling*(vert_offset + 172), 
-        scaling*24, scaling*8))
-        self.wall_colliders.append(pygame.Rect(scaling*36, scaling*(vert_offset + 180), 
-        scaling*8, scaling*24))
-        self.wall_colliders.append(pygame.Rect(scaling*180, scaling*(vert_offset + 172), 
-        scaling*24, scaling*8))
-        self.wall_colliders.append(pygame.Rect(scaling*180, scaling*(vert_offset + 180), 
-        scaling*8, scaling*24))
-
-        #Bottom Ts
-        self.wall_colliders.append(pygame.Rect(scaling*84, scaling*(vert_offset + 148), 
-        scaling*56, scaling*8))
-        self.wall_colliders.append(pygame.Rect(scaling*108, scaling*(vert_offset + 156), 
-        scaling*8, scaling*24))
-        self.wall_colliders.append(pygame.Rect(scaling*84, scaling*(vert_offset + 196), 
-        scaling*56, scaling*8))
-        self.wall_colliders.append(pygame.Rect(scaling*108, scaling*(vert_offset + 204), 
-        scaling*8, scaling*24))
-        self.wall_colliders.append(pygame.Rect(scaling*60, scaling*(vert_offset + 196), 
-        scaling*8, scaling*24))
-        self.wall_colliders.append(pygame.Rect(scaling*20, scaling*(vert_offset + 220), 
-        scaling*72, scaling*8))
-        self.wall_colliders.append(pygame.Rect(scaling*156, scaling*(vert_offset + 196), 
-        scaling*8, scaling*24))
-        self.wall_colliders.append(pygame.Rect(scaling*132, scaling*(vert_offset + 220), 
-        scaling*72, scaling*8))
-
-        #Center block
-        self.wall_colliders.append(pygame.Rect(scaling*84, scaling*(vert_offset + 100), 
-        scaling*56, scaling*32))
+        for x, y, width, height in Map.LEVEL.wall_rects:
+            self.wall_colliders.append(pygame.Rect(scaling*x, scaling*(y + vert_offset), 
+                scaling*width, scaling*height))
 
-# Contains positions of all the pellets on the map
-class Pellets:
-    
-    def __init__(self, window, vert_offset):
-        self.add_regular_pellets(window, vert_offset)
-        self.add_super_pellets(window, vert_offset)
-
-    def add_regular_pellets(self, window, vert_offset):
-        self.regular_pellets = []
-        for i in range (12):
-            self.regular_pellets.append(RegularPellet(window, [11 + 8*i, 11 + vert_offset]))
-        for i in range (12):
-            self.regular_pellets.append(RegularPellet(window, [123 + 8*i, 11 + vert_offset]))
-
-        for i in range (25):
-            self.regular_pellets.append(RegularPellet(window, [51, 19 + vert_offset + 8*i]))
-        for i in range (25):
-            self.regular_pellets.append(RegularPellet(window, [171, 19 + vert_offset + 8*i]))
-
-        for i in range (26):
-            self.regular_pellets.append(RegularPellet(window, [11 + 8*i, 235 + vert_offset]))
-
-        for i in range (5):
-            self.regular_pellets.append(RegularPellet(window, [11 + 8*i, 43 + vert_offset]))
-        for i in range (14):
-            self.regular_pellets.append(RegularPellet(window, [59 + 8*i, 43 + vert_offset]))
-        for i in range (5):
-            self.regular_pellets.append(RegularPellet(window, [179 + 8*i, 43 + vert_offset]))
-
-        for i in range (5):
-            self.regular_pellets.append(RegularPellet(window, [11 + 8*i, 67 + vert_offset]))
-        for i in range (4):
-            self.regular_pellets.append(RegularPellet(window, [75 + 8*i, 67 + vert_offset]))
-        for i in range (4):
-            self.regular_pellets.append(RegularPellet(window, [123 + 8*i, 67 + vert_offset]))
-        for i in range (5):
-            self.regular_pellets.append(RegularPellet(window, [179 + 8*i, 67 + vert_offset]))
-
-        for i in range (5):
-            self.regular_pellets.append(RegularPellet(window, [11 + 8*i, 163 + vert_offset]))
-        for i in range (6):
-            self.regular_pellets.append(RegularPellet(window, [59 + 8*i, 163 + vert_offset]))
-        for i in range (6):
-            self.regular_pellets.append(RegularPellet(window, [123 + 8*i, 163 + vert_offset]))
-        for i in range (5):
-            self.regular_pellets.append(RegularPellet(window, [179 + 8*i, 163 + vert_offset]))
-        
-        for i in range (2):
-            self.regular_pellets.append(RegularPellet(window, [19 + 8*i, 187 + vert_offset]))
-        for i in range (7):
-            self.regular_pellets.append(RegularPellet(window, [51 + 8*i, 187 + vert_offset]))
-        for i in range (7):
-            self.regular_pellets.append(RegularPellet(window, [123 + 8*i, 187 + vert_offset]))
-        for i in range (2):
-            self.regular_pellets.append(RegularPellet(window, [195 + 8*i, 187 + vert_offset]))
-
-        for i in range (5):
-            self.regular_pellets.append(RegularPellet(window, [11 + 8*i, 211 + vert_offset]))
-        for i in range (4):
-            self.regular_pellets.append(RegularPellet(window, [75 + 8*i, 211 + vert_offset]))
-        for i in range (4):
-            self.regular_pellets.append(RegularPellet(window, [123 + 8*i, 211 + vert_offset]))
-        for i in range (5):
-            self.regular_pellets.append(RegularPellet(window, [179 + 8*i, 211 + vert_offset]))
-
-        self.regular_pellets.append(RegularPellet(window, [11, 19 + vert_offset]))
-        self.regular_pellets.append(RegularPellet(window, [11, 35 + vert_offset]))
-        for i in range (2):
-            self.regular_pellets.append(RegularPellet(window, [11, 51 + 8*i + vert_offset]))
-        for i in range (2):
-            self.regular_pellets.append(RegularPellet(window, [11, 171 + 8*i + vert_offset]))
-        for i in range (2):
-            self.regular_pellets.append(RegularPellet(window, [11, 219 + 8*i + vert_offset]))
-        
-        self.regular_pellets.append(RegularPellet(window, [211, 19 + vert_offset]))
-        self.regular_pellets.append(RegularPellet(window, [211, 35 + vert_offset]))
-        for i in range (2):
-            self.regular_pellets.append(RegularPellet(window, [211, 51 + 8*i + vert_offset]))
-        for i in range (2):
-            self.regular_pellets.append(RegularPellet(window, [211, 171 + 8*i + vert_offset]))
-        for i in range (2):
-            self.regular_pellets.append(RegularPellet(window, [211, 219 + 8*i + vert_offset]))
-
-        for i in range (2):
-            self.regular_pellets.append(RegularPellet(window, [27, 195 + 8*i + vert_offset]))
-        for i in range (2):
-            self.regular_pellets.append(RegularPellet(window, [195, 195 + 8*i + vert_offset]))
-
-        for i in range (2):
-            self.regular_pellets.append(RegularPellet(window, [75, 51 + 8*i + vert_offset]))
-        for i in range (2):
-            self.regular_pellets.append(RegularPellet(window, [75, 195 + 8*i + vert_offset]))
-        for i in range (2):
-            self.regular_pellets.append(RegularPellet(window, [147, 51 + 8*i + vert_offset]))
-        for i in range (2):
-            self.regular_pellets.append(RegularPellet(window, [147, 195 + 8*i + vert_offset]))
-
-        for i in range (3):
-            self.regular_pellets.append(RegularPellet(window, [99, 19 + 8*i + vert_offset]))
-        for i in range (2):
-            self.regular_pellets.append(RegularPellet(window, [99, 171 + 8*i + vert_offset]))
-        for i in range (2):
-            self.regular_pellets.append(RegularPellet(window, [99, 219 + 8*i + vert_offset]))
-        
-        for i in range (3):
-            self.regular_pellets.append(RegularPellet(window, [123, 19 + 8*i + vert_offset]))
-        for i in range (2):
-            self.regular_pellets.append(RegularPellet(window, [123, 171 + 8*i + vert_offset]))
-        for i in range (2):
-            self.regular_pellets.append(RegularPellet(window, [123, 219 + 8*i + vert_offset]))
-    def add_super_pellets(self, window, vert_offset):
-        self.super_pellets = []
-
-        self.super_pellets.append(SuperPellet(window, [8, 24 + vert_offset]))
-        self.super_pellets.append(SuperPellet(window, [208, 24 + vert_offset]))
-        self.super_pellets.append(SuperPellet(window, [8, 184 + vert_offset]))
-        self.super_pellets.append(SuperPellet(window, [208, 184 + vert_offset]))
-    def draw_all(self):
-        for pellet in self.regular_pellets:
-            pellet.draw()
-        for pellet in self.super_pellets:
-            pellet.draw()
+        self.collision_grid = CollisionGrid(self.wall_colliders, 
+            Map.MAP_WIDTH * scaling, (Map.MAP_HEIGHT - Map.FIELD_OFFSET + vert_offset) * scaling)
 
-# Contains all the music and sound effects
-class SFX:
-    pygame.mixer.init()
+    def collides(self, rect):
+        return self.collision_grid.collides(rect)
 
-    GAME_START = pygame.mixer.Sound(os.path.join("Assets/Sound", "game_start.wav"))
-    GAME_START.set_volume(0.5)
-    
-    MUNCH_1 = pygame.mixer.Sound(os.path.join("Assets/Sound", "munch_1.wav"))
-    MUNCH_1.set_volume(0.5)
-    MUNCH_2 = pygame.mixer.Sound(os.path.join("Assets/Sound", "munch_2.wav"))
-    MUNCH_2.set_volume(0.5)
-    current_munch = 1
+    def get_shared(vert_offset):
+        key = (Map.LEVEL, vert_offset)
+        if (key not in Walls.shared):
+            Walls.shared[key] = Walls(vert_offset)
+        return Walls.shared[key]
 
-    SIREN_1 = pygame.mixer.Sound(os.path.join("Assets/Sound", "siren_1.wav"))
-    SIREN_1.set_volume(0.3)
+# Contains positions of all the pellets on the map
+# A game's pellets are a board: one byte per tile, row by row, holding the TILE_TYPE of the pellet still on the tile
+# or 0. The pellets don't exist as objects, so a game's pellets are a single buffer that is cheap to store and snapshot
+# Without a window (headless simulation) the sprites aren't loaded
+class Pellets:
+    PELLET_CLASSES = [RegularPellet, SuperPellet]
+    NO_PELLET = 0
 
-    SUPER_PELLET = pygame.mixer.Sound(os.path.join("Assets/Sound", "power_pellet.wav"))
-    SUPER_PELLET.set_volume(0.5)
+    # The starting board and the rects of the pellets never change, so all the games running in the process
+    # share them (see get_shared())
+    shared = {}
 
-    EAT_GHOST = pygame.mixer.Sound(os.path.join("Assets/Sound", "eat_ghost.wav"))
-    EAT_GHOST.set_volume(0.5)
+    def __init__(self, window, vert_offset):
+        self.vert_offset = vert_offset
+        self.level = Map.LEVEL
+        self.window = window
+        self.initial_board, self.rects = Pellets.get_shared(vert_offset)
+        self.initial_count = len(self.initial_board) - self.initial_board.count(Pellets.NO_PELLET)
+
+        if (window is not None):
+            self.sprites = {pellet_class: Pellet.load_sprite(pellet_class) for pellet_class in Pellets.PELLET_CLASSES}
+
+        self.reset()
+
+    # Returns the starting board and the rect of the pellet every tile starts with (None on the other tiles)
+    # Pellets are centered on their tile
+    def get_shared(vert_offset):
+        key = (Map.LEVEL, vert_offset)
+        if (key not in Pellets.shared):
+            level = Map.LEVEL
+            board = bytearray(level.width * level.height)
+            rects = [None] * len(board)
+            for pellet_class in Pellets.PELLET_CLASSES:
+                width, height = pellet_class.SPRITE_SIZE
+                for x, y in level.get_tiles_of_type(pellet_class.TILE_TYPE):
+                    board[y * level.width + x] = pellet_class.TILE_TYPE
+                    rects[y * level.width + x] = pygame.Rect(
+                        (x*Map.TILE_SIZE + (Map.TILE_SIZE - width)//2)*Map.SCALING,
+                        (y*Map.TILE_SIZE + (Map.TILE_SIZE - height)//2 + vert_offset)*Map.SCALING,
+                        width*Map.SCALING, height*Map.SCALING)
+            Pellets.shared[key] = (bytes(board), tuple(rects))
+        return Pellets.shared[key]
+
+    def get_index(self, tile):
+        return tile[1] * self.level.width + tile[0]
+
+    def get_tile(self, x, y):
+        tile_size = Map.TILE_SIZE * Map.SCALING
+        return (x // tile_size, (y - self.vert_offset * Map.SCALING) // tile_size)
+
+    def has_pellet(self, tile):
+        return (0 <= tile[0] < self.level.width and 0 <= tile[1] < self.level.height 
+            and self.board[self.get_index(tile)] != Pellets.NO_PELLET)
+
+    # Returns the remaining pellets of a kind, by tile
+    def get_tiles(self, pellet_class):
+        width = self.level.width
+        return [(index % width, index // width) for index, tile_type in enumerate(self.board)
+            if tile_type == pellet_class.TILE_TYPE]
+
+    def get_rect(self, tile):
+        return self.rects[self.get_index(tile)]
+
+    def get_sprite(self, pellet_class):
+        return self.sprites[pellet_class]
+
+    # Returns the tiles of the pellets of a kind that touch the rectangle
+    # Only the tiles under the rectangle are looked at
+    def find_touching(self, pellet_class, rect):
+        first_x, first_y = self.get_tile(rect.left, rect.top)
+        last_x, last_y = self.get_tile(rect.right - 1, rect.bottom - 1)
+
+        # Characters can stand half outside the maze, e.g. in the tunnel
+        width = self.level.width
+        if (first_x < 0):
+            first_x = 0
+        if (last_x >= width):
+            last_x = width - 1
+        if (first_y < 0):
+            first_y = 0
+        if (last_y >= self.level.height):
+            last_y = self.level.height - 1
+
+        touching = []
+        for tile_y in range(first_y, last_y + 1):
+            for index in range(tile_y * width + first_x, tile_y * width + last_x + 1):
+                if (self.board[index] == pellet_class.TILE_TYPE and rect.colliderect(self.rects[index])):
+                    touching.append((index - tile_y * width, tile_y))
+
+        return touching
+
+    # Removes and returns the tiles of the pellets of a kind that touch the collider
+    def take_touching(self, pellet_class, collider):
+        taken = self.find_touching(pellet_class, collider)
+        for tile in taken:
+            self.board[self.get_index(tile)] = Pellets.NO_PELLET
+
+        self.remaining -= len(taken)
+        self.eaten_pellets.extend(taken)
+        return taken
+
+    def all_eaten(self):
+        return self.remaining == 0
+
+    # Puts every eaten pellet back on the map
+    def reset(self):
+        self.board = bytearray(self.initial_board)
+        self.remaining = self.initial_count
+
+        # Tiles of the pellets eaten since the last reset, in the order they were eaten
+        self.eaten_pellets = []
+
+    def get_snapshot(self):
+        return (bytes(self.board), self.remaining, tuple(self.eaten_pellets))
+
+    def restore_snapshot(self, snapshot):
+        board, self.remaining, eaten_pellets = snapshot
+        self.board = bytearray(board)
+        self.eaten_pellets = list(eaten_pellets)
 
-    DEATH_1 = pygame.mixer.Sound(os.path.join("Assets/Sound", "death_1.wav"))
-    DEATH_1.set_volume(0.3)
+# Contains all the music and sound effects
+# The mixer is only initialised by load(), so the game logic can run on machines without an audio device
+# Only the sound played first is decoded by load() itself, the rest are decoded on a background thread
+# while it plays. wait_until_loaded() has to be called before using them
+class SFX:
+    GAME_START = None
+    MUNCH_1 = None
+    MUNCH_2 = None
+    EAT_GHOST = None
+    DEATH_1 = None
+
+    SOUND_DIRECTORY = "Assets/Sound"
+
+    # Attribute, file and volume of every sound
+    FIRST_SOUND = ("GAME_START", "game_start.wav", 0.5)
+    BACKGROUND_SOUNDS = [
+        ("MUNCH_1", "munch_1.wav", 0.5),
+        ("MUNCH_2", "munch_2.wav", 0.5),
+        ("EAT_GHOST", "eat_ghost.wav", 0.5),
+        ("DEATH_1", "death_1.wav", 0.3)
+    ]
+
+    # The long loops aren't decoded into memory, pygame.mixer.music streams them from their files (see audio.py)
+    # Name -> (file, volume)
+    STREAMED_SOUNDS = {
+        "SIREN_1": ("siren_1.wav", 0.3),
+        "SUPER_PELLET": ("power_pellet.wav", 0.5)
+    }
+
+    loader = None
+    background_load_time = None
+
+    # What went wrong loading the background sounds, raised again by wait_until_loaded()
+    load_error = None
+
+    def load():
+        pygame.mixer.init()
+        SFX.load_error = None
+
+        SFX.load_sound(*SFX.FIRST_SOUND)
+
+        SFX.loader = threading.Thread(target=SFX.load_background_sounds, daemon=True)
+        SFX.loader.start()
+
+    # An exception would end the thread unnoticed, so it is kept for the thread waiting on it
+    def load_background_sounds():
+        start = perf_counter()
+        try:
+            for sound in SFX.BACKGROUND_SOUNDS:
+                SFX.load_sound(*sound)
+        except Exception as error:
+            SFX.load_error = error
+            return
+        SFX.background_load_time = perf_counter() - start
+
+    def load_sound(name, file_name, volume):
+        sound = pygame.mixer.Sound(os.path.join(SFX.SOUND_DIRECTORY, file_name))
+        sound.set_volume(volume)
+        setattr(SFX, name, sound)
+
+    def get_streamed_path(name):
+        return os.path.join(SFX.SOUND_DIRECTORY, SFX.STREAMED_SOUNDS[name][0])
+
+    # Bytes held by the sounds loaded so far, decoded into the mixer's format
+    def get_decoded_size():
+        size = 0
+        for name, file_name, volume in [SFX.FIRST_SOUND] + SFX.BACKGROUND_SOUNDS:
+            sound = getattr(SFX, name)
+            if (sound is not None):
+                size += len(sound.get_raw())
+        return size
+
+    def wait_until_loaded():
+        if (SFX.loader is not None):
+            SFX.loader.join()
+            SFX.loader = None
+
+        if (SFX.load_error is not None):
+            raise SFX.load_error
+
+# Loads the textures, the font and the sounds (see SFX). Only needed when the game is drawn on the screen
+def load_resources():
+    Map.load_resources()
+    SFX.load()
@@ -0,0 +1,125 @@
+import numpy as np
+
+import characters as char
+import environment as env
+import simulation as sim
+import userevents as ue
+
+# Reinforcement learning environment in the style of Gym: reset() starts a game, step(action) plays one tick
+# Needs NumPy, which the game itself doesn't
+#
+# The observation is a grid of the maze tiles with one channel per kind of thing that can be on a tile:
+#
+#   observation[GymEnvironment.WALKABLE, y, x]          1 on the tiles of Map.MAP_GRAPH
+#   observation[GymEnvironment.PELLET, y, x]            1 while the tile has a regular pellet
+#   observation[GymEnvironment.SUPER_PELLET, y, x]      1 while the tile has a super pellet
+#   observation[GymEnvironment.PAC_MAN, y, x]           1 on Pac-Man's tile
+#   observation[GymEnvironment.GHOSTS + state.value]    Number of ghosts in that GhostState on the tile
+#
+# The same array is updated in place and returned by every call, only the tiles that changed are written,
+# so stepping allocates no arrays. Copy it to keep an observation for later
+class GymEnvironment:
+    # Action i steers Pac-Man in ACTIONS[i], None keeps him going the way he faces
+    ACTIONS = [None] + list(char.Direction)
+
+    WALKABLE = 0
+    PELLET = 1
+    SUPER_PELLET = 2
+    PAC_MAN = 3
+    GHOSTS = 4
+    CHANNEL_COUNT = GHOSTS + len(char.GhostState)
+
+    # Rewards are the scores of the events, and being caught costs as much as eating 100 pellets
+    REWARDS = dict(sim.EVENT_SCORES)
+    REWARDS[ue.UserEvents.GAME_OVER] = -10000
+
+    # Games are cut off here, so a policy that runs from the ghosts forever still ends its episodes
+    MAX_TICKS = 24 * 60 * 5
+
+    def __init__(self, max_ticks=MAX_TICKS):
+        self.max_ticks = max_ticks
+        self.width = env.Map.LEVEL.width
+        self.height = env.Map.LEVEL.height
+
+        self.observation = np.zeros((GymEnvironment.CHANNEL_COUNT, self.height, self.width), dtype=np.uint8)
+        for x, y in env.Map.MAP_GRAPH.graph:
+            self.observation[GymEnvironment.WALKABLE, y, x] = 1
+
+        # Pellet channels of a full board, copied in whenever the board is reset
+        initial_board, _ = env.Pellets.get_shared(env.Map.FIELD_OFFSET)
+        board = np.frombuffer(initial_board, dtype=np.uint8).reshape(self.height, self.width)
+        self.initial_pellets = np.stack([board == env.RegularPellet.TILE_TYPE,
+            board == env.SuperPellet.TILE_TYPE]).astype(np.uint8)
+
+        self.simulation = None
+        self.seed = None
+
+        # Where the characters were marked in the observation, to clear them before marking the new tiles
+        self.marked_characters = []
+
+        # Pellets of the current board already cleared from the observation and the level they were on
+        self.cleared_pellet_count = 0
+        self.level = None
+
+    # The game has no randomness, every episode starts the same. The seed is only kept, for the caller's records
+    def reset(self, seed=None):
+        self.seed = seed
+        self.simulation = sim.Simulation()
+
+        self.observation[GymEnvironment.PAC_MAN:].fill(0)
+        self.marked_characters = []
+        self.level = None
+        self.update_pellets()
+        self.update_characters()
+
+        return self.observation
+
+    # action is an index into ACTIONS
+    # Returns (observation, reward, done, info)
+    def step(self, action):
+        simulation = self.simulation
+        events = simulation.step(GymEnvironment.ACTIONS[action])
+
+        self.update_pellets()
+        self.update_characters()
+
+        reward = 0
+        for event in events:
+            reward += GymEnvironment.REWARDS.get(event, 0)
+
+        done = simulation.game_over or simulation.tick >= self.max_ticks
+        info = {"score": simulation.score, "tick": simulation.tick, "level": simulation.level, "events": events}
+
+        return self.observation, reward, done, info
+
+    # Clears the pellets eaten since the last update, or fills in a new board after the level was cleared
+    def update_pellets(self):
+        pellets = self.simulation.pellets
+        if (self.simulation.level != self.level or len(pellets.eaten_pellets) < self.cleared_pellet_count):
+            self.observation[GymEnvironment.PELLET:GymEnvironment.SUPER_PELLET + 1] = self.initial_pellets
+            self.cleared_pellet_count = 0
+            self.level = self.simulation.level
+
+        observation = self.observation
+        for x, y in pellets.eaten_pellets[self.cleared_pellet_count:]:
+            observation[GymEnvironment.PELLET, y, x] = 0
+            observation[GymEnvironment.SUPER_PELLET, y, x] = 0
+        self.cleared_pellet_count = len(pellets.eaten_pellets)
+
+    def update_characters(self):
+        observation = self.observation
+        for channel, x, y in self.marked_characters:
+            observation[channel, y, x] -= 1
+
+        marked = self.marked_characters
+        marked.clear()
+        self.mark_character(GymEnvironment.PAC_MAN, self.simulation.pac_man)
+        for ghost in self.simulation.ghosts:
+            self.mark_character(GymEnvironment.GHOSTS + ghost.current_state.value, ghost)
+
+    # Characters that left the maze (it can happen beyond the tunnel) aren't on any tile and aren't marked
+    def mark_character(self, channel, character):
+        x, y = character.get_current_tile()
+        if (0 <= y < self.height):
+            self.observation[channel, y, x] += 1
+            self.marked_characters.append((channel, x, y))
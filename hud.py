@@ -0,0 +1,122 @@
+import pygame
+import profiler
+
+TEXT_COLOR = (255, 255, 255)
+
+# Rendered text surfaces, kept by content so the same text is only rasterized once
+class TextCache:
+    def __init__(self, font):
+        self.font = font
+        self.surfaces = {}
+
+    def render(self, text, color=TEXT_COLOR):
+        key = (text, color)
+        if (key not in self.surfaces):
+            self.surfaces[key] = self.font.render(text, 0, color)
+        return self.surfaces[key]
+
+# A set of characters rendered once into one surface
+# The font is monospaced, so any string made of these characters can be put together glyph by glyph
+# with plain blits, without rasterizing anything
+class GlyphAtlas:
+    def __init__(self, font, characters, color=TEXT_COLOR):
+        self.atlas = font.render(characters, 0, color)
+        self.advance = font.size(characters[0])[0]
+        self.glyph_areas = {}
+        for index, character in enumerate(characters):
+            self.glyph_areas[character] = pygame.Rect(index * self.advance, 0, self.advance, self.atlas.get_height())
+
+    def get_size(self, text):
+        return (self.advance * len(text), self.atlas.get_height())
+
+    def draw(self, surface, text, position):
+        x, y = position
+        for character in text:
+            surface.blit(self.atlas, (x, y), self.glyph_areas[character])
+            x += self.advance
+
+# Everything drawn on top of the maze: the score and the messages
+class Hud:
+    SCORE_LABEL = "SCORE: "
+
+    # The score surface is made wide enough for this many digits, a longer score makes it grow once
+    SCORE_DIGITS = 9
+
+    def __init__(self, font):
+        self.text_cache = TextCache(font)
+        self.digits = GlyphAtlas(font, "0123456789")
+
+        # The score is put together from the label and the digit glyphs only when it changes,
+        # always into the same surface
+        self.score = None
+        self.score_surface = None
+        self.allocate_score_surface(Hud.SCORE_DIGITS)
+
+    def allocate_score_surface(self, digit_count):
+        label = self.text_cache.render(Hud.SCORE_LABEL)
+        digits_size = self.digits.get_size("0" * digit_count)
+        self.score_surface = pygame.Surface((label.get_width() + digits_size[0],
+            max(label.get_height(), digits_size[1])), pygame.SRCALPHA)
+
+    def draw_score(self, window, score):
+        if (score != self.score):
+            self.compose_score(score)
+        return window.blit(self.score_surface, (0, 0))
+
+    def compose_score(self, score):
+        label = self.text_cache.render(Hud.SCORE_LABEL)
+        digits = str(score)
+        if (label.get_width() + self.digits.get_size(digits)[0] > self.score_surface.get_width()):
+            self.allocate_score_surface(len(digits))
+
+        self.score_surface.fill((0, 0, 0, 0))
+        self.score_surface.blit(label, (0, 0))
+        self.digits.draw(self.score_surface, digits, (label.get_width(), 0))
+
+        self.score = score
+
+    # Draws the text in the middle of the window
+    def draw_message(self, window, text):
+        text_surface = self.text_cache.render(text)
+        return window.blit(text_surface, ((window.get_width() - text_surface.get_width())//2,
+            (window.get_height() - text_surface.get_height())//2))
+
+# Table of the profiler's per-frame percentiles (see profiler.py), drawn in the top right corner of the window
+# The numbers are only rendered again every REFRESH_INTERVAL frames, so the overlay itself costs little
+class ProfilerOverlay:
+    REFRESH_INTERVAL = 12
+    BACKGROUND_COLOR = (0, 0, 0, 192)
+
+    def __init__(self, font):
+        self.font = font
+        self.surface = None
+        self.frames_until_refresh = 0
+
+    # Returns the area of the window that was drawn on, or None when there is no profiler running
+    def draw(self, window):
+        if (profiler.active is None):
+            return None
+
+        if (self.frames_until_refresh == 0 or self.surface is None):
+            self.compose(profiler.active)
+            self.frames_until_refresh = ProfilerOverlay.REFRESH_INTERVAL
+        self.frames_until_refresh -= 1
+
+        return window.blit(self.surface, (window.get_width() - self.surface.get_width(), 0))
+
+    def compose(self, active_profiler):
+        lines = ["{:18}".format("ms/frame") + "".join(" {:>6}".format("p{}".format(percent))
+            for percent in profiler.Profiler.PERCENTILES)]
+        for phase in active_profiler.get_phases():
+            lines.append("{:18}".format(phase) + "".join(" {:6.2f}".format(duration * 1000)
+                for duration in active_profiler.get_percentiles(phase)))
+
+        line_surfaces = [self.font.render(line, 0, TEXT_COLOR) for line in lines]
+        self.surface = pygame.Surface((max(surface.get_width() for surface in line_surfaces),
+            sum(surface.get_height() for surface in line_surfaces)), pygame.SRCALPHA)
+        self.surface.fill(ProfilerOverlay.BACKGROUND_COLOR)
+
+        y = 0
+        for line_surface in line_surfaces:
+            self.surface.blit(line_surface, (0, y))
+            y += line_surface.get_height()
@@ -0,0 +1,304 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+
+# A maze and everything placed in it, described once, tile by tile. The walkable graph, the wall colliders
+# and the pellets are all derived from the same tiles, so they can't disagree with each other.
+#
+# Level files are text: a few header lines, then the tiles, one character per tile
+#
+#   pac_man 13 17                             Pac-Man's spawn tile
+#   ghost_house 13 11                         Tile defeated ghosts return to
+#   ghost RED 1 1 / 1 1, 12 1, 12 11, 6 11    Ghost color, spawn tile / patrol tiles in order (one line per ghost)
+#   tiles
+#   XXXXXXXX...                               X wall, O empty path, . path with a pellet, o path with a super pellet
+#
+# Lines starting with ";" are comments. Levels are compiled (see compile()) into a binary file that is
+# memory-mapped when loaded, so nothing has to be parsed or derived again until the text file changes
+class Level:
+    WALL = 0
+    PATH = 1
+    PELLET = 2
+    SUPER_PELLET = 3
+
+    TILE_CHARACTERS = {"X": WALL, "O": PATH, ".": PELLET, "o": SUPER_PELLET}
+
+    # Walls are made of half tiles: every walkable tile keeps a free space of half a tile around it
+    WALL_UNIT = 4
+
+    COMPILED_MAGIC = b"PMLV"
+    COMPILED_VERSION = 1
+
+    # Magic, version, digest of the source text, width, height
+    HEADER = struct.Struct("<4sH20sHH")
+    POINT = struct.Struct("<HH")
+    COUNT = struct.Struct("<H")
+    RECT = struct.Struct("<HHHH")
+
+    def __init__(self):
+        self.width = 0
+        self.height = 0
+
+        # One tile type per tile, row by row
+        self.tiles = b""
+
+        self.pac_man_spawn = None
+        self.ghost_house = None
+
+        # (color name, spawn tile, patrol tiles) of every ghost
+        self.ghosts = []
+
+        # (x, y, width, height) in unscaled pixels, relative to the top left corner of the maze
+        self.wall_rects = []
+
+        # Digest of the text the level was read from
+        self.source_digest = None
+
+    def get_tile(self, x, y):
+        return self.tiles[y * self.width + x]
+
+    def is_walkable(self, x, y):
+        return (0 <= x < self.width and 0 <= y < self.height and self.get_tile(x, y) != Level.WALL)
+
+    def get_tiles_of_type(self, tile_type):
+        return [(x, y) for y in range(self.height) for x in range(self.width) if self.get_tile(x, y) == tile_type]
+
+    # The walkable tiles in the format MapGraph.FromMapString reads (X wall, O path)
+    def get_map_string(self):
+        return "\n".join("".join("O" if self.is_walkable(x, y) else "X" for x in range(self.width))
+            for y in range(self.height))
+
+    def FromText(text):
+        level = Level()
+        level.source_digest = hashlib.sha1(text.encode()).digest()
+
+        lines = [line.rstrip() for line in text.split("\n")]
+        tile_rows = None
+        for line_number, line in enumerate(lines, 1):
+            if (tile_rows is not None):
+                if (line):
+                    tile_rows.append((line_number, line))
+                continue
+            if (not line or line.startswith(";")):
+                continue
+
+            keyword, _, arguments = line.partition(" ")
+            if (keyword == "tiles"):
+                tile_rows = []
+            elif (keyword == "pac_man"):
+                level.pac_man_spawn = Level.parse_point(arguments, line_number)
+            elif (keyword == "ghost_house"):
+                level.ghost_house = Level.parse_point(arguments, line_number)
+            elif (keyword == "ghost"):
+                color, _, points = arguments.partition(" ")
+                spawn, _, patrol = points.partition("/")
+                level.ghosts.append((color, Level.parse_point(spawn, line_number),
+                    [Level.parse_point(point, line_number) for point in patrol.split(",")]))
+            else:
+                raise ValueError("Line {}: unknown keyword {!r}".format(line_number, keyword))
+
+        if (not tile_rows):
+            raise ValueError("The level has no tiles")
+        if (level.pac_man_spawn is None or level.ghost_house is None):
+            raise ValueError("The level needs pac_man and ghost_house")
+
+        level.width = len(tile_rows[0][1])
+        level.height = len(tile_rows)
+        tiles = bytearray()
+        for line_number, row in tile_rows:
+            if (len(row) != level.width):
+                raise ValueError("Line {}: expected {} tiles, found {}".format(line_number, level.width, len(row)))
+            for character in row:
+                if (character not in Level.TILE_CHARACTERS):
+                    raise ValueError("Line {}: unknown tile {!r}".format(line_number, character))
+                tiles.append(Level.TILE_CHARACTERS[character])
+        level.tiles = bytes(tiles)
+
+        for point in [level.pac_man_spawn, level.ghost_house] + [spawn for color, spawn, patrol in level.ghosts]:
+            if (not level.is_walkable(*point)):
+                raise ValueError("{} is not a walkable tile".format(point))
+
+        level.wall_rects = level.build_wall_rects()
+        return level
+
+    def parse_point(text, line_number):
+        coordinates = text.split()
+        if (len(coordinates) != 2):
+            raise ValueError("Line {}: expected a tile as two numbers, found {!r}".format(line_number, text))
+        return (int(coordinates[0]), int(coordinates[1]))
+
+    # Everything farther than half a tile from a walkable tile is wall
+    # The wall cells are merged into as few rectangles as is simple: runs of cells in a row,
+    # grown downwards while the rows below have the same run
+    def build_wall_rects(self):
+        columns = self.width * 2
+        rows = self.height * 2
+
+        free = [[False] * columns for _ in range(rows)]
+        for y in range(self.height):
+            for x in range(self.width):
+                if (self.is_walkable(x, y)):
+                    for row in range(max(2*y - 1, 0), min(2*y + 3, rows)):
+                        for column in range(max(2*x - 1, 0), min(2*x + 3, columns)):
+                            free[row][column] = True
+
+        open_rects = {}
+        rects = []
+        for row in range(rows + 1):
+            runs = []
+            column = 0
+            while (row < rows and column < columns):
+                if (free[row][column]):
+                    column += 1
+                    continue
+                start = column
+                while (column < columns and not free[row][column]):
+                    column += 1
+                runs.append((start, column))
+
+            next_open_rects = {}
+            for run in runs:
+                if (run in open_rects):
+                    next_open_rects[run] = open_rects.pop(run)
+                else:
+                    next_open_rects[run] = row
+            for (start, end), first_row in open_rects.items():
+                rects.append((start, first_row, end - start, row - first_row))
+            open_rects = next_open_rects
+
+        rects.sort(key=lambda rect: (rect[1], rect[0]))
+        return [(x * Level.WALL_UNIT, y * Level.WALL_UNIT, width * Level.WALL_UNIT, height * Level.WALL_UNIT)
+            for x, y, width, height in rects]
+
+    def compile(self):
+        parts = [Level.HEADER.pack(Level.COMPILED_MAGIC, Level.COMPILED_VERSION, self.source_digest,
+            self.width, self.height), self.tiles,
+            Level.POINT.pack(*self.pac_man_spawn), Level.POINT.pack(*self.ghost_house),
+            Level.COUNT.pack(len(self.ghosts))]
+
+        for color, spawn, patrol_points in self.ghosts:
+            color = color.encode()
+            parts.append(Level.COUNT.pack(len(color)) + color)
+            parts.append(Level.POINT.pack(*spawn))
+            parts.append(Level.COUNT.pack(len(patrol_points)))
+            parts.extend(Level.POINT.pack(*point) for point in patrol_points)
+
+        parts.append(Level.COUNT.pack(len(self.wall_rects)))
+        parts.extend(Level.RECT.pack(*rect) for rect in self.wall_rects)
+        return b"".join(parts)
+
+    # buffer is anything supporting the buffer protocol, e.g. the mmap of a compiled level file
+    # Raises ValueError unless the buffer holds exactly one compiled level, e.g. if the file was cut short
+    def FromCompiled(buffer):
+        Level.check_fits(buffer, 0, Level.HEADER.size)
+        magic, version, source_digest, width, height = Level.HEADER.unpack_from(buffer)
+        if (magic != Level.COMPILED_MAGIC or version != Level.COMPILED_VERSION):
+            raise ValueError("Not a version {} compiled level".format(Level.COMPILED_VERSION))
+
+        level = Level()
+        level.source_digest = bytes(source_digest)
+        level.width = width
+        level.height = height
+
+        offset = Level.HEADER.size
+        Level.check_fits(buffer, offset, width * height + 2 * Level.POINT.size + Level.COUNT.size)
+        level.tiles = bytes(buffer[offset:offset + width * height])
+        offset += width * height
+
+        level.pac_man_spawn = Level.POINT.unpack_from(buffer, offset)
+        level.ghost_house = Level.POINT.unpack_from(buffer, offset + Level.POINT.size)
+        offset += 2 * Level.POINT.size
+
+        ghost_count, = Level.COUNT.unpack_from(buffer, offset)
+        offset += Level.COUNT.size
+        for _ in range(ghost_count):
+            Level.check_fits(buffer, offset, Level.COUNT.size)
+            name_length, = Level.COUNT.unpack_from(buffer, offset)
+            offset += Level.COUNT.size
+            Level.check_fits(buffer, offset, name_length + Level.POINT.size + Level.COUNT.size)
+            color = bytes(buffer[offset:offset + name_length]).decode()
+            offset += name_length
+
+            spawn = Level.POINT.unpack_from(buffer, offset)
+            patrol_count, = Level.COUNT.unpack_from(buffer, offset + Level.POINT.size)
+            offset += Level.POINT.size + Level.COUNT.size
+            Level.check_fits(buffer, offset, patrol_count * Level.POINT.size)
+            patrol_points = [point for point in Level.POINT.iter_unpack(
+                buffer[offset:offset + patrol_count * Level.POINT.size])]
+            offset += patrol_count * Level.POINT.size
+
+            level.ghosts.append((color, spawn, patrol_points))
+
+        Level.check_fits(buffer, offset, Level.COUNT.size)
+        wall_count, = Level.COUNT.unpack_from(buffer, offset)
+        offset += Level.COUNT.size
+        Level.check_fits(buffer, offset, wall_count * Level.RECT.size)
+        level.wall_rects = list(Level.RECT.iter_unpack(buffer[offset:offset + wall_count * Level.RECT.size]))
+        offset += wall_count * Level.RECT.size
+
+        if (offset != len(buffer)):
+            raise ValueError("{} bytes left over after the compiled level".format(len(buffer) - offset))
+        return level
+
+    def check_fits(buffer, offset, size):
+        if (offset + size > len(buffer)):
+            raise ValueError("The compiled level is cut short: {} bytes needed at offset {}, the buffer has {}".format(
+                size, offset, len(buffer)))
+
+    # Written next to the file and moved over it, so another process loading the level never sees half a file
+    def save_compiled(self, path):
+        temporary_path = "{}.{}.tmp".format(path, os.getpid())
+        try:
+            with open(temporary_path, "wb") as file:
+                file.write(self.compile())
+            os.replace(temporary_path, path)
+        except OSError:
+            if (os.path.exists(temporary_path)):
+                os.remove(temporary_path)
+            raise
+
+    def load_compiled(path):
+        with open(path, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                return Level.FromCompiled(buffer)
+
+    def load_text(path):
+        with open(path) as file:
+            return Level.FromText(file.read())
+
+    # Uses the compiled level if it was compiled from the current text, otherwise compiles the text again
+    # The check reads the text file, but skips parsing it and deriving the walls
+    def load_or_compile(source_path, compiled_path):
+        with open(source_path) as file:
+            text = file.read()
+
+        if (os.path.exists(compiled_path)):
+            try:
+                level = Level.load_compiled(compiled_path)
+                if (level.source_digest == hashlib.sha1(text.encode()).digest()):
+                    return level
+            except (ValueError, struct.error):
+                pass
+
+        level = Level.FromText(text)
+        try:
+            level.save_compiled(compiled_path)
+        except OSError:
+            # A read-only install still works, it just compiles the level every time
+            pass
+        return level
+
+# Compiles level files ahead of time, e.g. when packaging the game
+# Usage: python level.py LEVEL.txt... (writes LEVEL.lvl next to every LEVEL.txt)
+def main(paths):
+    for path in paths:
+        level = Level.load_text(path)
+        compiled_path = os.path.splitext(path)[0] + ".lvl"
+        level.save_compiled(compiled_path)
+        print("{}: {}x{} tiles, {} walls, {} ghosts -> {}".format(path, level.width, level.height,
+            len(level.wall_rects), len(level.ghosts), compiled_path))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,138 +1,225 @@
-from threading import Thread
-import pygame
 import time
-import characters as char
+
+# Measured from here, the time the interpreter took to start isn't part of the startup report
+STARTUP_START = time.perf_counter()
+
+import argparse
+import pygame
+import audio
 import environment as env
-import userevents as ue
+import hud
+import profiler
+import renderer as rd
+import replay
+import simulation as sim
 
 # Basic pygame information
-TARGET_FPS = 24
+# The window is redrawn at TARGET_FPS (0 for as often as possible), independently of the game speed,
+# which is always sim.TICKS_PER_SECOND
+TARGET_FPS = 60
 SCREEN_WIDTH, SCREEN_HEIGHT = (env.Map.MAP_WIDTH * env.Map.SCALING, env.Map.MAP_HEIGHT * env.Map.SCALING)
-WIN = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Pac-Clone")
+
+# The window, the background, the HUD and the sound player are created by init_display(),
+# so importing this module doesn't open a window
+WIN = None
+BG = None
+HUD = None
+SOUNDS = None
 
 # Time durations for different actions
-POWER_PELLET_DURATION = 5
 GAME_OVER_DURATION = 5
+TICK_DURATION = 1 / sim.TICKS_PER_SECOND
+
+# If drawing falls this many ticks behind, the game slows down instead of trying to catch up
+MAX_TICKS_PER_FRAME = 5
+
+# Only redraw the parts of the window that changed instead of the whole window every frame
+USE_DIRTY_RECTS = True
+
+# Steps of the startup, see main(startup_report=True)
+STARTUP = profiler.StartupTimer(STARTUP_START)
+
+# Shows or hides the profiler overlay
+PROFILER_OVERLAY_KEY = pygame.K_F3
+PROFILER_FONT_SIZE = 8
+
+def init_display():
+    global WIN, BG, HUD, SOUNDS
+
+    WIN = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Pac-Clone")
+    STARTUP.mark("display")
+
+    env.Map.load_resources()
+    BG = pygame.transform.scale(
+        env.Map.MAP_TEXTURE, (SCREEN_WIDTH, SCREEN_HEIGHT - env.Map.FIELD_OFFSET * env.Map.SCALING)
+    )
+    HUD = hud.Hud(env.Map.MAIN_FONT)
+    STARTUP.mark("map and font")
+
+    # The rest of the sounds keep loading in the background
+    env.SFX.load()
+    SOUNDS = audio.SoundPlayer()
+    STARTUP.mark("first sound")
+
+# Plays a game with the keyboard, or plays back a recorded one (see replay.py) in real time
+# With record_path set, the game's input is saved there when it ends
+# With profile set the profiler runs from the start with its overlay shown, and with trace_path set
+# the time of every phase of every frame is written there (see profiler.py)
+# With startup_report set, the time every step of the startup took is printed once the first frame is drawn
+def main(record_path=None, replay_path=None, profile=False, trace_path=None, startup_report=False):
+    STARTUP.mark("imports")
+    init_display()
+    
+    clock = pygame.time.Clock()
 
-# Resources
+    recording = None
+    if (replay_path is not None):
+        played_back = replay.InputRecording.load(replay_path)
+    else:
+        played_back = None
+        if (record_path is not None):
+            recording = replay.InputRecording()
 
-BG = pygame.transform.scale(
-    env.Map.MAP_TEXTURE, (SCREEN_WIDTH, SCREEN_HEIGHT - env.Map.FIELD_OFFSET * env.Map.SCALING)
-)
+    simulation = sim.Simulation(WIN, recording)
+    if (USE_DIRTY_RECTS):
+        renderer = rd.DirtyRectRenderer(WIN, BG, HUD)
+    else:
+        renderer = rd.FullRedrawRenderer(WIN, BG, HUD)
 
-def main():
-    
-    clock = pygame.time.Clock()
+    # The overlay can also be turned on during the game, which starts the profiler if it isn't running
+    keep_profiling = profile or trace_path is not None
+    if (keep_profiling):
+        profiler.start(trace_path=trace_path)
+    profiler_overlay = hud.ProfilerOverlay(pygame.font.Font(env.Map.FONT_PATH, PROFILER_FONT_SIZE))
+    if (profile):
+        renderer.overlay = profiler_overlay
+
+    STARTUP.mark("game setup")
 
-    score = 0
-
-    pac_man = char.PacMan(WIN, (13, 17))
-    walls = env.Walls(env.Map.FIELD_OFFSET)
-    pellets = env.Pellets(WIN, env.Map.FIELD_OFFSET)
-    ghosts = [
-        char.Ghost(WIN, (1, 1), char.GhostColor.RED, [(1, 1), (12, 1), (12, 11), (6, 11)]),
-        char.Ghost(WIN, (1, 29), char.GhostColor.RED, [(1, 29), (7, 23), (12, 29)]),
-        char.Ghost(WIN, (26, 1), char.GhostColor.RED, [(27-1, 29), (27-12, 1), (27-12, 11), (27-6, 11)]),
-        char.Ghost(WIN, (26, 29), char.GhostColor.RED, [(27-1, 29), (27-7, 23), (27-12, 29)])
-    ]
-    # Function to be executed in a separate thread to make ghosts vulnerable for a short amount of time
-    def make_ghosts_vulnerable():
-        env.SFX.SUPER_PELLET.stop()
-        env.SFX.SUPER_PELLET.play(loops=-1, maxtime = int(POWER_PELLET_DURATION * 1000))
-        for ghost in ghosts:
-            ghost.put_on_vulnerability()
-        
-        time.sleep(POWER_PELLET_DURATION)
-
-        for ghost in ghosts:
-            ghost.take_off_vulnerability()
-
-    play_intro(pellets, walls, ghosts, pac_man)
+    play_intro(simulation, renderer, startup_report)
 
     run = True
     
-    # This sound plays constantly throughout the game 
-    env.SFX.SIREN_1.play(-1)
+    # The intro gives the sounds time to load
+    env.SFX.wait_until_loaded()
+    if (startup_report):
+        print("{:24} {:8.1f} ms, in the background".format("other sounds", env.SFX.background_load_time * 1000))
+
+    # The siren plays constantly throughout the game, except while a power pellet is active
+    SOUNDS.update_music(False)
+
+    # Real time not yet simulated
+    lag = 0
+    previous_time = time.perf_counter()
 
     while run:
         clock.tick(TARGET_FPS)
 
+        current_time = time.perf_counter()
+        lag = min(lag + current_time - previous_time, MAX_TICKS_PER_FRAME * TICK_DURATION)
+        previous_time = current_time
+
         keys_pressed = pygame.key.get_pressed()
 
-        #React to different events
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 run = False
-            if event.type == ue.UserEvents.ATE_REGULAR_PELLET:
-                score += 100
-            if event.type == ue.UserEvents.ATE_SUPER_PELLET:
-                score += 500
-                thread = Thread(target = make_ghosts_vulnerable)
-                thread.start()
-            if event.type == ue.UserEvents.ATE_GHOST:
-                score += 1000
-            if event.type == ue.UserEvents.GAME_OVER:
-                env.SFX.SIREN_1.stop()
-                env.SFX.DEATH_1.play()
-                display_game_over()
-                run = False
-        
-        # Drawing and character updates
-
-        draw_window()
-        pellets.draw_all()
-        pac_man.update(keys_pressed, walls, pellets, ghosts)
-        for ghost in ghosts:
-            ghost.update(walls, pac_man)
-        draw_score(score)
-
-        pygame.display.update()
-
+            elif event.type == pygame.KEYDOWN and event.key == PROFILER_OVERLAY_KEY:
+                toggle_profiler_overlay(renderer, profiler_overlay, keep_profiling)
+
+        # Character updates, as many ticks as fit in the time that passed
+        if (profiler.active is not None):
+            start = time.perf_counter()
+        while (lag >= TICK_DURATION and not simulation.game_over):
+            if (played_back is not None):
+                if (simulation.tick >= played_back.get_tick_count()):
+                    run = False
+                    break
+                direction = played_back.get_direction(simulation.tick)
+            else:
+                direction = simulation.pac_man.find_new_direction(keys_pressed)
+            events = simulation.step(direction)
+            lag -= TICK_DURATION
+
+            # React to different game events
+            SOUNDS.play_event_sounds(events)
+            if (simulation.game_over):
+                SOUNDS.play_death()
+            else:
+                SOUNDS.update_music(simulation.active_power_pellets > 0)
+
+        if (profiler.active is not None):
+            profiler.active.add("simulation", start)
+            start = time.perf_counter()
+
+        # Drawing, with the characters placed between the last two ticks
+        renderer.draw(simulation, lag / TICK_DURATION)
+
+        if (profiler.active is not None):
+            profiler.active.add("render", start)
+            profiler.active.end_frame()
+
+        if (simulation.game_over):
+            display_game_over()
+            run = False
+
+    if (recording is not None):
+        recording.finish(simulation)
+        recording.save(record_path)
+
+    profiler.stop()
     pygame.quit()
 
+def toggle_profiler_overlay(renderer, overlay, keep_profiling):
+    if (renderer.overlay is None):
+        if (profiler.active is None):
+            profiler.start()
+        renderer.overlay = overlay
+    else:
+        renderer.overlay = None
+        if (not keep_profiling):
+            profiler.stop()
+    
+    # Clears the overlay from the window
+    renderer.invalidate()
+
 # Debug function used to draw invisible colliders
 def debug_draw_rectangles(rectangles):
     for rectangle in rectangles:
         pygame.draw.rect(WIN, (0, 255, 0), rectangle)
 
-def play_intro(pellets, walls, ghosts, pac_man):
-    draw_first_frame(pellets, walls, ghosts, pac_man)
+def play_intro(simulation, renderer, startup_report=False):
+    renderer.draw(simulation)
+
+    STARTUP.mark("first frame")
+    if (startup_report):
+        print(STARTUP.report())
 
     display_ready_message()
+    renderer.invalidate()
 
-    env.SFX.GAME_START.play()
+    SOUNDS.play(env.SFX.GAME_START)
     time.sleep(env.SFX.GAME_START.get_length())
 
-# Draws the first frame for the intro sequence
-def draw_first_frame(pellets, walls, ghosts, pac_man):
-    draw_window()
-    pellets.draw_all()
-    pac_man.update(pygame.key.get_pressed(), walls, pellets, ghosts)
-    for ghost in ghosts:
-        ghost.update(walls, pac_man)
-    draw_score(0)
-
-    pygame.display.update()
-
 def display_ready_message():
-    ready_text = env.Map.MAIN_FONT.render("READY!", 0, (255, 255, 255))
-    WIN.blit(ready_text, ((SCREEN_WIDTH - ready_text.get_width())//2, (SCREEN_HEIGHT - ready_text.get_height())//2))
+    HUD.draw_message(WIN, "READY!")
     pygame.display.update()
 
-def draw_window():
-    pygame.draw.rect(WIN, (0, 0, 0), pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT))
-    WIN.blit(BG, (0, env.Map.FIELD_OFFSET*env.Map.SCALING))
-
-def draw_score(score):
-    score_text = env.Map.MAIN_FONT.render("SCORE: " + str(score), 0, (255, 255, 255))
-    WIN.blit(score_text, (0, 0))
-
 def display_game_over():
-    game_over_text = env.Map.MAIN_FONT.render("GAME OVER", 0, (255, 255, 255))
-    WIN.blit(game_over_text, ((SCREEN_WIDTH - game_over_text.get_width())//2, (SCREEN_HEIGHT - game_over_text.get_height())//2))
+    HUD.draw_message(WIN, "GAME OVER")
     pygame.display.update()
     time.sleep(GAME_OVER_DURATION)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    # A played back game isn't recorded, its input is already in the recording
+    input_group = parser.add_mutually_exclusive_group()
+    input_group.add_argument("--record", metavar="PATH", help="save the input of the game to PATH")
+    input_group.add_argument("--replay", metavar="PATH", help="play back the game recorded in PATH")
+    parser.add_argument("--profile", action="store_true", help="show how long every part of a frame takes")
+    parser.add_argument("--trace", metavar="PATH", help="write the profile of every frame to PATH")
+    parser.add_argument("--startup-report", action="store_true", help="print how long starting the game took")
+    arguments = parser.parse_args()
+
+    main(arguments.record, arguments.replay, arguments.profile, arguments.trace, arguments.startup_report)
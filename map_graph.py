@@ -1,12 +1,48 @@
-from queue import PriorityQueue
+from heapq import heappush, heappop
+from array import array
+from collections import deque
+import hashlib
+import os
+
+from cluster_graph import ClusterGraph
+from corridor_graph import CorridorGraph
 
 
 class MapGraph:
+    # Marks a pair of points that can't reach each other in the path table
+    UNREACHABLE = 0xFFFF
+    PATH_TABLE_MAGIC = b"PMPT"
+
     def __init__(self):
         self.graph = {}
+
+        # Size of the maze, used to account for the wrap-around tunnels in the heuristic
+        self.width = None
+        self.height = None
+
+        # Search statistics
+        self.search_count = 0
+        self.expansion_count = 0
+
+        # Optional all-pairs table (see build_path_table)
+        self.points = None
+        self.point_index = None
+        self.distances = None
+        self.next_hops = None
+
+        # Optional searches over a smaller graph (see build_corridor_graph and build_cluster_graph)
+        self.corridor_graph = None
+        self.cluster_graph = None
+
+        # Last flow field handed out (see get_flow_field)
+        self.flow_field = None
     
     def add_point(self, point, neighbors):
         self.graph[point] = neighbors
+        self.clear_path_table()
+        self.corridor_graph = None
+        self.cluster_graph = None
+        self.flow_field = None
     
     def neighbors(self, point):
         return self.graph[point]
@@ -15,6 +51,10 @@ class MapGraph:
         map_graph = MapGraph()
         map_matrix = MapGraph.create_and_verify_map_matrix(map_string)
 
+        if (len(map_matrix) > 0):
+            map_graph.width = len(map_matrix[0])
+            map_graph.height = len(map_matrix)
+
         for j in range (len(map_matrix)):
             for i in range(len(map_matrix[0])):
                 if (map_matrix[j][i] == "O"):
@@ -64,32 +104,57 @@ class MapGraph:
         return map_matrix
 
     def get_shortest_path(self, start, finish):
+        if (self.has_path_table(start, finish)):
+            return self.lookup_shortest_path(start, finish)
+        if (self.cluster_graph is not None):
+            return self.cluster_graph.get_shortest_path(start, finish)
+        if (self.corridor_graph is not None):
+            return self.corridor_graph.get_shortest_path(start, finish)
+
         came_from = self.build_shortest_path(start, finish)
         return MapGraph.trace_shortest_path(came_from, start, finish)
     
+    # A* on a binary heap. Entries are (f-cost, heuristic, point): among equal f-costs the point closest
+    # to the finish is expanded first, and points already expanded at a lower cost are skipped when popped
     def build_shortest_path(self, start, finish):
-        frontier = PriorityQueue()
-        frontier.put(start, 0)
+        self.search_count += 1
+        heuristic = self.estimate_distance(start, finish)
+        frontier = [(heuristic, heuristic, start)]
         came_from = {}
         cost_so_far = {}
         came_from[start] = None
         cost_so_far[start] = 0
 
-        while not frontier.empty():
-            current = frontier.get()
+        while frontier:
+            priority, heuristic, current = heappop(frontier)
 
             if (current == finish):
                 break
-            
+
+            if (priority - heuristic > cost_so_far[current]):
+                continue
+
+            self.expansion_count += 1
+            new_cost = cost_so_far[current] + 1
             for next_move in self.neighbors(current):
-                new_cost = cost_so_far[current] + 1
                 if next_move not in cost_so_far or new_cost < cost_so_far[next_move]:
                     cost_so_far[next_move] = new_cost
-                    priority = new_cost + MapGraph.manhattan_distance(next_move, finish)
-                    frontier.put(next_move, priority)
+                    heuristic = self.estimate_distance(next_move, finish)
+                    heappush(frontier, (new_cost + heuristic, heuristic, next_move))
                     came_from[next_move] = current
         
         return came_from
+
+    # Manhattan distance where each axis can also be crossed through the edge of the maze
+    def estimate_distance(self, point1, point2):
+        distance_x = abs(point1[0] - point2[0])
+        distance_y = abs(point1[1] - point2[1])
+
+        if (self.width is not None):
+            distance_x = min(distance_x, self.width - distance_x)
+            distance_y = min(distance_y, self.height - distance_y)
+
+        return distance_x + distance_y
     
     def manhattan_distance(point1, point2):
         return abs(point1[0] - point2[0]) + abs(point1[1] - point2[1])
@@ -105,4 +170,235 @@ class MapGraph:
         
         reverse_path.reverse()
 
-        return reverse_path
\ No newline at end of file
+        return reverse_path
+
+    # All-pairs path table
+    # The maze never changes, so instead of searching every frame we can run one BFS per point
+    # at load time and remember the distance and the first step of every shortest path.
+    # Both tables are flat arrays indexed by [start_index * point_count + finish_index]
+    def build_path_table(self):
+        self.points = sorted(self.graph)
+        self.point_index = {point: index for index, point in enumerate(self.points)}
+
+        point_count = len(self.points)
+        neighbor_indices = [[self.point_index[neighbor] for neighbor in self.graph[point]] for point in self.points]
+
+        self.distances = array("H", [MapGraph.UNREACHABLE]) * (point_count * point_count)
+        self.next_hops = array("H", [MapGraph.UNREACHABLE]) * (point_count * point_count)
+
+        # BFS from every finish point. When a point is discovered from the current one,
+        # the current point is its first step towards the finish
+        for finish in range(point_count):
+            self.distances[finish * point_count + finish] = 0
+            self.next_hops[finish * point_count + finish] = finish
+            frontier = deque([finish])
+
+            while frontier:
+                current = frontier.popleft()
+                new_distance = self.distances[current * point_count + finish] + 1
+
+                for next_point in neighbor_indices[current]:
+                    cell = next_point * point_count + finish
+                    if (self.distances[cell] == MapGraph.UNREACHABLE):
+                        self.distances[cell] = new_distance
+                        self.next_hops[cell] = current
+                        frontier.append(next_point)
+
+    # Searches only branch at junctions and dead ends, corridors are crossed in one step (see CorridorGraph)
+    # Paths are still the shortest ones
+    def build_corridor_graph(self):
+        self.corridor_graph = CorridorGraph(self)
+
+    # Large mazes can't hold a path table (it grows with the square of the number of points), but searching
+    # the whole maze for every query is too slow. The cluster graph answers the queries the path table doesn't.
+    # Short paths and paths through one tile wide corridors are the shortest ones, long paths across open areas
+    # can be longer (see ClusterGraph)
+    def build_cluster_graph(self, cluster_size=ClusterGraph.DEFAULT_CLUSTER_SIZE):
+        self.cluster_graph = ClusterGraph(self, cluster_size)
+
+    def clear_path_table(self):
+        self.points = None
+        self.point_index = None
+        self.distances = None
+        self.next_hops = None
+
+    # Points outside the graph (e.g. a character inside the tunnel) still go through the regular search
+    def has_path_table(self, start, finish):
+        return (self.point_index is not None
+            and start in self.point_index and finish in self.point_index)
+
+    def lookup_shortest_path(self, start, finish):
+        point_count = len(self.points)
+        current = self.point_index[start]
+        finish_index = self.point_index[finish]
+
+        if (self.distances[current * point_count + finish_index] == MapGraph.UNREACHABLE):
+            raise KeyError(finish)
+
+        path = [start]
+        while (current != finish_index):
+            current = self.next_hops[current * point_count + finish_index]
+            path.append(self.points[current])
+
+        return path
+
+    # Number of steps between two points, or None if one can't be reached from the other
+    def get_distance(self, start, finish):
+        if (self.has_path_table(start, finish)):
+            distance = self.distances[self.point_index[start] * len(self.points) + self.point_index[finish]]
+            return None if distance == MapGraph.UNREACHABLE else distance
+
+        try:
+            return len(self.get_shortest_path(start, finish)) - 1
+        except KeyError:
+            return None
+
+    # First tile to step on when going from start to finish
+    def get_next_step(self, start, finish):
+        if (self.has_path_table(start, finish)):
+            point_count = len(self.points)
+            start_index = self.point_index[start]
+            finish_index = self.point_index[finish]
+
+            if (self.distances[start_index * point_count + finish_index] == MapGraph.UNREACHABLE):
+                raise KeyError(finish)
+            return self.points[self.next_hops[start_index * point_count + finish_index]]
+
+        path = self.get_shortest_path(start, finish)
+        return path[1] if len(path) > 1 else path[0]
+
+    # Distance field towards the target, see FlowField
+    # The last field is kept until it is asked for another target, so everyone heading to the same point
+    # in the same tick (e.g. all the ghosts chasing Pac-Man) shares one field
+    # Raises KeyError if the target isn't on the graph
+    def get_flow_field(self, target):
+        if (self.flow_field is None or self.flow_field.target != target):
+            self.flow_field = FlowField(self, target)
+        return self.flow_field
+
+    # Identifies the graph, so a table saved for a different maze is never loaded
+    def get_graph_digest(self):
+        description = repr(sorted((point, sorted(neighbors)) for point, neighbors in self.graph.items()))
+        return hashlib.sha1(description.encode("ascii")).digest()
+
+    # File layout: magic, graph digest (20 bytes), point count (uint32), then the distance and next hop arrays
+    def save_path_table(self, file_path):
+        point_count = len(self.points)
+
+        with open(file_path, "wb") as file:
+            file.write(MapGraph.PATH_TABLE_MAGIC)
+            file.write(self.get_graph_digest())
+            file.write(point_count.to_bytes(4, "little"))
+            self.distances.tofile(file)
+            self.next_hops.tofile(file)
+
+    # Returns False if the file is missing or was made for another maze
+    def load_path_table(self, file_path):
+        if (not os.path.exists(file_path)):
+            return False
+
+        with open(file_path, "rb") as file:
+            if (file.read(len(MapGraph.PATH_TABLE_MAGIC)) != MapGraph.PATH_TABLE_MAGIC):
+                return False
+            if (file.read(20) != self.get_graph_digest()):
+                return False
+
+            point_count = int.from_bytes(file.read(4), "little")
+            if (point_count != len(self.graph)):
+                return False
+
+            distances = array("H")
+            next_hops = array("H")
+            try:
+                distances.fromfile(file, point_count * point_count)
+                next_hops.fromfile(file, point_count * point_count)
+            except EOFError:
+                return False
+
+        self.points = sorted(self.graph)
+        self.point_index = {point: index for index, point in enumerate(self.points)}
+        self.distances = distances
+        self.next_hops = next_hops
+
+        return True
+
+    # Loads the table from the cache file, or builds it and writes the cache for the next start
+    def load_or_build_path_table(self, file_path):
+        if (self.load_path_table(file_path)):
+            return
+
+        self.build_path_table()
+        try:
+            self.save_path_table(file_path)
+        except OSError:
+            # A read-only install still works, it just builds the table on every start
+            pass
+
+
+# Number of steps from every point of the graph to one target
+# Going downhill (to the neighbor with the smallest distance) follows a shortest path to the target,
+# going uphill moves as far away from it as one step can
+# With a path table the distances are a column of the table, otherwise they come from one BFS from the target
+class FlowField:
+    def __init__(self, map_graph, target):
+        if (target not in map_graph.graph):
+            raise KeyError(target)
+
+        self.map_graph = map_graph
+        self.target = target
+
+        if (map_graph.has_path_table(target, target)):
+            point_count = len(map_graph.points)
+            self.point_index = map_graph.point_index
+            self.distances = map_graph.distances[map_graph.point_index[target]::point_count]
+        else:
+            self.point_index = {point: index for index, point in enumerate(sorted(map_graph.graph))}
+            self.distances = array("H", [MapGraph.UNREACHABLE]) * len(self.point_index)
+            self.distances[self.point_index[target]] = 0
+
+            frontier = deque([target])
+            while frontier:
+                current = frontier.popleft()
+                new_distance = self.distances[self.point_index[current]] + 1
+                for next_point in map_graph.neighbors(current):
+                    if (self.distances[self.point_index[next_point]] == MapGraph.UNREACHABLE):
+                        self.distances[self.point_index[next_point]] = new_distance
+                        frontier.append(next_point)
+
+    # None if the point can't reach the target
+    def get_distance(self, point):
+        index = self.point_index.get(point)
+        if (index is None or self.distances[index] == MapGraph.UNREACHABLE):
+            return None
+        return self.distances[index]
+
+    # Neighbor of the point that is closest to the target, the point itself at the target or off the field
+    # Among equally close neighbors the first one wins
+    def get_downhill_step(self, point):
+        best_distance = self.get_distance(point)
+        if (not best_distance):
+            return point
+
+        best_step = point
+        for neighbor in self.map_graph.neighbors(point):
+            distance = self.distances[self.point_index[neighbor]]
+            if (distance < best_distance):
+                best_step = neighbor
+                best_distance = distance
+        return best_step
+
+    # Neighbor of the point that is farthest from the target, the point itself at the target or off the field
+    # Moving on is always better than waiting to be caught, so the best neighbor is taken
+    # even if it is closer than the point. Among equally far neighbors the first one wins
+    def get_uphill_step(self, point):
+        if (not self.get_distance(point)):
+            return point
+
+        best_step = point
+        best_distance = -1
+        for neighbor in self.map_graph.neighbors(point):
+            distance = self.distances[self.point_index[neighbor]]
+            if (distance != MapGraph.UNREACHABLE and distance > best_distance):
+                best_step = neighbor
+                best_distance = distance
+        return best_step
@@ -0,0 +1,90 @@
+import json
+from collections import deque
+from time import perf_counter
+
+# The running profiler, None when profiling is off
+# Instrumented code checks it before timing anything, so with profiling off every phase costs one global lookup:
+#
+#   if (profiler.active is not None):
+#       start = perf_counter()
+#   ...
+#   if (profiler.active is not None):
+#       profiler.active.add("phase", start)
+active = None
+
+def start(history=240, trace_path=None):
+    global active
+    active = Profiler(history, trace_path)
+    return active
+
+def stop():
+    global active
+    if (active is not None):
+        active.close()
+    active = None
+
+# Time spent in every phase of a frame, kept for the last `history` frames
+# Phases that run more than once per frame (e.g. one per ghost or per tick) are summed up
+class Profiler:
+    PERCENTILES = [50, 95, 99]
+
+    def __init__(self, history=240, trace_path=None):
+        self.history = history
+        self.frame_times = {}
+        self.current_frame = {}
+        self.frame_count = 0
+
+        # One JSON object per frame, with the time of every phase in seconds
+        self.trace = None
+        if (trace_path is not None):
+            self.trace = open(trace_path, "w")
+
+    # start is the perf_counter() value at the beginning of the phase
+    def add(self, phase, start):
+        self.current_frame[phase] = self.current_frame.get(phase, 0) + perf_counter() - start
+
+    def end_frame(self):
+        for phase, duration in self.current_frame.items():
+            if (phase not in self.frame_times):
+                self.frame_times[phase] = deque(maxlen=self.history)
+            self.frame_times[phase].append(duration)
+
+        if (self.trace is not None):
+            self.current_frame["frame"] = self.frame_count
+            self.trace.write(json.dumps(self.current_frame) + "\n")
+
+        self.current_frame = {}
+        self.frame_count += 1
+
+    def get_phases(self):
+        return sorted(self.frame_times)
+
+    # Returns the PERCENTILES of the phase's time per frame, in seconds
+    # Frames in which the phase didn't run don't count
+    def get_percentiles(self, phase):
+        durations = sorted(self.frame_times[phase])
+        return [durations[min(len(durations) - 1, len(durations) * percent // 100)]
+            for percent in Profiler.PERCENTILES]
+
+    def close(self):
+        if (self.trace is not None):
+            self.trace.close()
+            self.trace = None
+
+# Time between the steps of starting the game, e.g. imports, loading the assets and drawing the first frame
+class StartupTimer:
+    def __init__(self, start):
+        self.start = start
+        self.previous = start
+        self.steps = []
+
+    # Ends the step that started at the previous mark
+    def mark(self, step):
+        now = perf_counter()
+        self.steps.append((step, now - self.previous))
+        self.previous = now
+
+    def report(self):
+        lines = ["{:24} {:8.1f} ms".format(step, duration * 1000) for step, duration in self.steps]
+        lines.append("{:24} {:8.1f} ms".format("total", (self.previous - self.start) * 1000))
+        return "\n".join(lines)
@@ -0,0 +1,174 @@
+import pygame
+from time import perf_counter
+import environment as env
+import profiler
+
+# The maze with all the remaining pellets, composited into one surface when a level starts
+# Pellets never move, so instead of drawing each of them every frame, eaten ones are erased
+# from the cached surface by copying the empty maze over their rect
+class PelletLayer:
+    def __init__(self, window_size, background):
+        self.empty_maze = pygame.Surface(window_size)
+        self.empty_maze.fill((0, 0, 0))
+        self.empty_maze.blit(background, (0, env.Map.FIELD_OFFSET*env.Map.SCALING))
+
+        self.surface = self.empty_maze.copy()
+        self.level = None
+        self.erased_pellet_count = 0
+
+    # Brings the layer up to date with the simulation and returns the rects that changed,
+    # or None if the whole layer was composited again
+    def update(self, simulation):
+        pellets = simulation.pellets
+
+        # A new level, or pellets came back (e.g. a snapshot of the game was restored)
+        if (simulation.level != self.level or len(pellets.eaten_pellets) < self.erased_pellet_count):
+            self.bake(pellets)
+            self.level = simulation.level
+            return None
+
+        erased_rects = []
+        for tile in pellets.eaten_pellets[self.erased_pellet_count:]:
+            rect = pellets.get_rect(tile)
+            self.surface.blit(self.empty_maze, rect, rect)
+            erased_rects.append(rect)
+        self.erased_pellet_count = len(pellets.eaten_pellets)
+
+        return erased_rects
+
+    def bake(self, pellets):
+        self.surface.blit(self.empty_maze, (0, 0))
+        for pellet_class in env.Pellets.PELLET_CLASSES:
+            sprite = pellets.get_sprite(pellet_class)
+            for tile in pellets.get_tiles(pellet_class):
+                self.surface.blit(sprite, pellets.get_rect(tile))
+
+        self.erased_pellet_count = len(pellets.eaten_pellets)
+
+# Draws the characters between their positions of the previous and the current tick
+# The window can be drawn any number of times per tick, but the animations only advance once per tick
+class CharacterAnimator:
+    def __init__(self):
+        # The first drawn tick shows the first frames of the animations
+        self.animated_tick = None
+
+    # Returns the areas of the window that were drawn on
+    def draw(self, simulation, alpha):
+        new_tick = (self.animated_tick is not None and simulation.tick != self.animated_tick)
+        self.animated_tick = simulation.tick
+
+        sprite_rects = [simulation.pac_man.animate(alpha, new_tick)]
+        for ghost in simulation.ghosts:
+            sprite_rects.append(ghost.animate(alpha, new_tick))
+        return sprite_rects
+
+# Draws the whole window every frame
+class FullRedrawRenderer:
+    def __init__(self, window, background, hud):
+        self.window = window
+        self.hud = hud
+        self.pellet_layer = PelletLayer(window.get_size(), background)
+        self.character_animator = CharacterAnimator()
+
+        # Drawn on top of everything else, e.g. a ProfilerOverlay
+        self.overlay = None
+
+    # Nothing is cached between frames
+    def invalidate(self):
+        pass
+
+    # alpha is how far the game is between the previous tick and the next one (0 to 1)
+    def draw(self, simulation, alpha=1.0):
+        self.pellet_layer.update(simulation)
+        self.window.blit(self.pellet_layer.surface, (0, 0))
+
+        self.character_animator.draw(simulation, alpha)
+        self.hud.draw_score(self.window, simulation.score)
+        if (self.overlay is not None):
+            self.overlay.draw(self.window)
+
+        update_display()
+
+# Only redraws and pushes to the display the parts of the window that changed since the previous frame:
+# where the characters were and are now, eaten pellets and the score
+# Those areas are restored from the pellet layer before drawing on them
+class DirtyRectRenderer:
+    def __init__(self, window, background, hud):
+        self.window = window
+        self.hud = hud
+        self.pellet_layer = PelletLayer(window.get_size(), background)
+
+        self.score_area = pygame.Rect(0, 0, window.get_width(), env.Map.FIELD_OFFSET*env.Map.SCALING)
+        self.character_animator = CharacterAnimator()
+
+        # Drawn on top of everything else, e.g. a ProfilerOverlay
+        self.overlay = None
+
+        self.invalidate()
+
+    # Makes the next frame redraw the whole window, e.g. after a message was drawn over it
+    def invalidate(self):
+        self.needs_full_redraw = True
+        self.previous_sprite_rects = []
+        self.previous_score = None
+        self.previous_overlay_rect = None
+
+    # alpha is how far the game is between the previous tick and the next one (0 to 1)
+    def draw(self, simulation, alpha=1.0):
+        changed_pellet_rects = self.pellet_layer.update(simulation)
+
+        if (self.needs_full_redraw or changed_pellet_rects is None):
+            self.draw_everything(simulation, alpha)
+            return
+
+        # Erase the characters where they were drawn in the previous frame, the pellets eaten since then
+        # and the overlay
+        dirty_rects = self.previous_sprite_rects + changed_pellet_rects
+        if (self.previous_overlay_rect is not None):
+            dirty_rects.append(self.previous_overlay_rect)
+            self.previous_overlay_rect = None
+        for rect in dirty_rects:
+            self.restore_background(rect)
+
+        self.previous_sprite_rects = self.character_animator.draw(simulation, alpha)
+        dirty_rects.extend(self.previous_sprite_rects)
+
+        if (simulation.score != self.previous_score):
+            self.restore_background(self.score_area)
+            self.hud.draw_score(self.window, simulation.score)
+            self.previous_score = simulation.score
+            dirty_rects.append(self.score_area)
+
+        if (self.overlay is not None):
+            self.previous_overlay_rect = self.overlay.draw(self.window)
+            dirty_rects.append(self.previous_overlay_rect)
+
+        update_display(dirty_rects)
+
+    def draw_everything(self, simulation, alpha):
+        self.window.blit(self.pellet_layer.surface, (0, 0))
+        self.previous_sprite_rects = self.character_animator.draw(simulation, alpha)
+        self.hud.draw_score(self.window, simulation.score)
+        if (self.overlay is not None):
+            self.previous_overlay_rect = self.overlay.draw(self.window)
+
+        self.needs_full_redraw = False
+        self.previous_score = simulation.score
+
+        update_display()
+
+    def restore_background(self, rect):
+        self.window.blit(self.pellet_layer.surface, rect, rect)
+
+# Pushes the window to the screen, the given areas only or the whole window without rects
+def update_display(rects=None):
+    if (profiler.active is not None):
+        start = perf_counter()
+
+    if (rects is None):
+        pygame.display.update()
+    else:
+        pygame.display.update(rects)
+
+    if (profiler.active is not None):
+        profiler.active.add("display.update", start)
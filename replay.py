@@ -0,0 +1,95 @@
+import struct
+import sys
+import time
+
+import characters as char
+import simulation as sim
+
+# The direction Pac-Man was steered in on every tick of a game
+# The game has no randomness, so the directions alone are enough to play the same game again
+# In files every direction takes 2 bits, 4 ticks per byte
+class InputRecording:
+    MAGIC = b"PACR"
+    VERSION = 1
+
+    # Magic, version, number of ticks, score at the end of the recording
+    HEADER = struct.Struct("<4sBII")
+
+    DIRECTIONS = list(char.Direction)
+    TICKS_PER_BYTE = 4
+
+    def __init__(self):
+        # One Direction value per tick, packed only when saved
+        self.directions = bytearray()
+        self.final_score = 0
+
+    def record(self, direction):
+        self.directions.append(direction.value)
+
+    # Marks the end of the recording, so replays can be checked against it
+    def finish(self, simulation):
+        self.final_score = simulation.score
+
+    def get_tick_count(self):
+        return len(self.directions)
+
+    def get_direction(self, tick):
+        return InputRecording.DIRECTIONS[self.directions[tick]]
+
+    def pack(self):
+        packed = bytearray((len(self.directions) + InputRecording.TICKS_PER_BYTE - 1) // InputRecording.TICKS_PER_BYTE)
+        for tick, value in enumerate(self.directions):
+            packed[tick // InputRecording.TICKS_PER_BYTE] |= value << (2 * (tick % InputRecording.TICKS_PER_BYTE))
+
+        return InputRecording.HEADER.pack(InputRecording.MAGIC, InputRecording.VERSION,
+            len(self.directions), self.final_score) + packed
+
+    def unpack(data):
+        magic, version, tick_count, final_score = InputRecording.HEADER.unpack_from(data)
+        if (magic != InputRecording.MAGIC or version != InputRecording.VERSION):
+            raise ValueError("Not a version {} input recording".format(InputRecording.VERSION))
+
+        packed = data[InputRecording.HEADER.size:]
+        if (len(packed) * InputRecording.TICKS_PER_BYTE < tick_count):
+            raise ValueError("Input recording is truncated")
+
+        recording = InputRecording()
+        recording.final_score = final_score
+        recording.directions = bytearray((packed[tick // InputRecording.TICKS_PER_BYTE] >> (2 * (tick % InputRecording.TICKS_PER_BYTE))) & 3
+            for tick in range(tick_count))
+        return recording
+
+    def save(self, path):
+        with open(path, "wb") as file:
+            file.write(self.pack())
+
+    def load(path):
+        with open(path, "rb") as file:
+            return InputRecording.unpack(file.read())
+
+# Plays the recorded game as fast as possible, without drawing anything, and returns the simulation
+def replay(recording):
+    simulation = sim.Simulation()
+    for tick in range(recording.get_tick_count()):
+        simulation.step(recording.get_direction(tick))
+    return simulation
+
+# Replays the given recordings headless and reports whether they still end with the recorded score
+# Usage: python replay.py RECORDING...
+def main(paths):
+    for path in paths:
+        recording = InputRecording.load(path)
+
+        start = time.perf_counter()
+        simulation = replay(recording)
+        duration = time.perf_counter() - start
+
+        if (simulation.score == recording.final_score):
+            result = "OK"
+        else:
+            result = "DIVERGED (recorded score {})".format(recording.final_score)
+        print("{}: {} ticks, score {}, {:.0f} ticks/s, {}".format(path, recording.get_tick_count(),
+            simulation.score, recording.get_tick_count() / duration, result))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,52 @@
+from heapq import heappush, heappop
+
+# Runs callbacks after a given number of simulation ticks
+# Everything happens inside advance(), called once per tick from the game loop, so timed effects
+# are deterministic and follow the simulation speed instead of the wall clock
+class Scheduler:
+    def __init__(self):
+        self.tick = 0
+        self.queue = []
+
+        # Keeps callbacks scheduled for the same tick in the order they were scheduled
+        self.scheduled_count = 0
+
+    # Returns a handle that can be passed to cancel()
+    def schedule(self, delay, callback, *args):
+        entry = [self.tick + max(delay, 1), self.scheduled_count, callback, args]
+        self.scheduled_count += 1
+        heappush(self.queue, entry)
+        return entry
+
+    def cancel(self, entry):
+        if (entry is not None):
+            # The entry stays in the queue and is skipped when its tick comes
+            entry[2] = None
+
+    def advance(self):
+        self.tick += 1
+
+        while (self.queue and self.queue[0][0] <= self.tick):
+            due_tick, order, callback, args = heappop(self.queue)
+            if (callback is not None):
+                callback(*args)
+
+    def ticks_until(self, entry):
+        return entry[0] - self.tick
+
+    # Cancelled callbacks are part of the snapshot too, so restoring keeps them cancelled
+    def get_snapshot(self):
+        return (self.tick, self.scheduled_count, tuple(tuple(entry) for entry in self.queue))
+
+    # The handles returned by schedule() before restoring don't belong to this scheduler anymore,
+    # find_entry() gives the restored ones
+    def restore_snapshot(self, snapshot):
+        self.tick, self.scheduled_count, entries = snapshot
+        self.queue = [list(entry) for entry in entries]
+
+    # Returns the handle of the callback that was scheduled as the order-th one, if it hasn't run yet
+    def find_entry(self, order):
+        for entry in self.queue:
+            if (entry[1] == order):
+                return entry
+        return None
@@ -0,0 +1,226 @@
+from time import perf_counter
+
+import characters as char
+import environment as env
+import profiler
+import userevents as ue
+from scheduler import Scheduler
+
+# The game logic advances in fixed ticks, one per frame of the original game
+TICKS_PER_SECOND = 24
+
+# Time durations (in seconds) for different actions
+POWER_PELLET_DURATION = 5
+FRIGHT_FLASH_DURATION = 2
+GHOST_RESPAWN_DELAY = 1
+
+# Vulnerable ghosts switch between normal and flashing sprites this often (in ticks)
+FRIGHT_FLASH_INTERVAL = 4
+
+# Spawn points of Pac-Man and the ghosts and the patrol points of the ghosts come from the level
+PAC_MAN_SPAWN_POINT = env.Map.LEVEL.pac_man_spawn
+GHOSTS = [(spawn_pos, char.GhostColor[color], patrol_points)
+    for color, spawn_pos, patrol_points in env.Map.LEVEL.ghosts]
+
+# Cells of the grid the ghosts are found by, two characters wide (see SpatialHash)
+GHOST_GRID_CELL_SIZE = 2 * char.GameCharacter.CHARACTER_SPRITE_SIZE[0] * env.Map.SCALING
+
+# Below this many ghosts, one pygame call over the colliders of all the ghosts finds them faster than the grid
+# (see benchmarks/swarm.py)
+GHOST_GRID_MIN_COUNT = 500
+
+# Scores for the game events
+EVENT_SCORES = {
+    ue.UserEvents.ATE_REGULAR_PELLET: 100,
+    ue.UserEvents.ATE_SUPER_PELLET: 500,
+    ue.UserEvents.ATE_GHOST: 1000
+}
+
+# Game state and logic, independent of the display, the font and the mixer
+# With window set to None nothing is loaded or drawn, so games can run headless and as fast as the CPU allows
+# Given an InputRecording (see replay.py), every tick's direction is recorded into it
+# ghosts replaces the level's ghosts with other (spawn tile, GhostColor, patrol tiles), e.g. for ghost swarm modes
+class Simulation:
+    def __init__(self, window=None, recording=None, ghosts=None):
+        self.window = window
+        self.recording = recording
+
+        self.tick = 0
+        self.score = 0
+        self.level = 1
+        self.game_over = False
+
+        self.pac_man = char.PacMan(window, PAC_MAN_SPAWN_POINT)
+        self.walls = env.Walls.get_shared(env.Map.FIELD_OFFSET)
+        self.pellets = env.Pellets(window, env.Map.FIELD_OFFSET)
+        self.ghosts = [char.Ghost(window, spawn_pos, color, patrol_points)
+            for spawn_pos, color, patrol_points in (ghosts if ghosts is not None else GHOSTS)]
+
+        # The colliders of the ghosts, in the order of the ghosts. The characters only ever move their colliders,
+        # so the lists stay up to date. A ghost's eat collider lags behind its body for a tick after it wraps
+        # around through the tunnel, so both are kept
+        self.ghost_bodies = [ghost.body_collider for ghost in self.ghosts]
+        self.ghost_eat_colliders = [ghost.eat_collider for ghost in self.ghosts]
+
+        # Ghosts by where they are, for the queries of swarms too big for testing every ghost
+        self.ghost_grid = env.SpatialHash(GHOST_GRID_CELL_SIZE)
+        self.ghost_grid_tick = None
+
+        # Timed effects
+        self.scheduler = Scheduler()
+        self.active_power_pellets = 0
+        self.fright_flash = None
+        self.flashing = False
+        self.respawning_ghosts = []
+
+    # Advances the game by one tick, no matter how long it took in real time and returns the events (see UserEvents) that happened during it
+    # No direction means Pac-Man keeps going the way he is facing
+    def step(self, direction=None):
+        events = []
+
+        if (self.recording is not None):
+            if (direction is None):
+                direction = self.pac_man.direction
+            self.recording.record(direction)
+
+        self.pac_man.remember_position()
+        for ghost in self.ghosts:
+            ghost.remember_position()
+
+        if (profiler.active is not None):
+            start = perf_counter()
+        self.pac_man.update(direction, self.walls, self.pellets, self.ghosts, self.ghost_bodies, events)
+        if (profiler.active is not None):
+            profiler.active.add("pac_man.update", start)
+            start = perf_counter()
+        for ghost in self.ghosts:
+            ghost.update(self.walls, self.pac_man)
+        if (profiler.active is not None):
+            profiler.active.add("ghost.update", start)
+            start = perf_counter()
+
+        for index in self.pac_man.body_collider.collidelistall(self.ghost_eat_colliders):
+            self.ghosts[index].eat_pac_man(self.pac_man, events)
+        if (profiler.active is not None):
+            profiler.active.add("ghost.collisions", start)
+
+        if (self.pellets.all_eaten()):
+            events.append(ue.UserEvents.LEVEL_CLEARED)
+
+        self.handle_events(events)
+        self.schedule_respawns()
+
+        self.tick += 1
+        self.scheduler.advance()
+
+        return events
+
+    # Brought up to date on the first query of a tick
+    def get_ghost_grid(self):
+        if (self.ghost_grid_tick != self.tick):
+            for ghost in self.ghosts:
+                self.ghost_grid.update(ghost, ghost.body_collider)
+            self.ghost_grid_tick = self.tick
+        return self.ghost_grid
+
+    # Ghosts whose body overlaps the rectangle, in no particular order
+    def find_ghosts_overlapping(self, rect):
+        if (len(self.ghosts) < GHOST_GRID_MIN_COUNT):
+            ghosts = self.ghosts
+            return [ghosts[index] for index in rect.collidelistall(self.ghost_bodies)]
+        return self.get_ghost_grid().find_overlapping(rect)
+
+    # Ghosts whose body touches the tiles at most radius tiles away from the tile
+    def find_ghosts_near_tile(self, tile, radius=0):
+        return self.find_ghosts_overlapping(env.Map.get_tile_area(tile, radius))
+
+    def handle_events(self, events):
+        for event in events:
+            self.score += EVENT_SCORES.get(event, 0)
+
+            if (event == ue.UserEvents.ATE_SUPER_PELLET):
+                self.make_ghosts_vulnerable()
+            elif (event == ue.UserEvents.GAME_OVER):
+                self.game_over = True
+            elif (event == ue.UserEvents.LEVEL_CLEARED):
+                self.level += 1
+                self.pellets.reset()
+
+    # Every power pellet wears off on its own, but ghosts only start flashing before the last one ends
+    def make_ghosts_vulnerable(self):
+        self.stop_fright_flash()
+        for ghost in self.ghosts:
+            ghost.put_on_vulnerability()
+
+        self.active_power_pellets += 1
+        duration = seconds_to_ticks(POWER_PELLET_DURATION)
+        self.scheduler.schedule(duration, self.end_power_pellet)
+        self.fright_flash = self.scheduler.schedule(duration - seconds_to_ticks(FRIGHT_FLASH_DURATION), 
+            self.toggle_fright_flash)
+
+    def end_power_pellet(self):
+        self.active_power_pellets -= 1
+        for ghost in self.ghosts:
+            ghost.take_off_vulnerability()
+
+        if (self.active_power_pellets == 0):
+            self.stop_fright_flash()
+
+    def toggle_fright_flash(self):
+        self.flashing = not self.flashing
+        for ghost in self.ghosts:
+            ghost.set_flashing(self.flashing)
+
+        self.fright_flash = self.scheduler.schedule(FRIGHT_FLASH_INTERVAL, self.toggle_fright_flash)
+
+    def stop_fright_flash(self):
+        self.scheduler.cancel(self.fright_flash)
+        self.fright_flash = None
+        self.flashing = False
+        for ghost in self.ghosts:
+            ghost.set_flashing(False)
+
+    # Defeated ghosts wait in the ghost house for a moment before they come back
+    def schedule_respawns(self):
+        for ghost in self.ghosts:
+            if (ghost.is_waiting_to_respawn() and ghost not in self.respawning_ghosts):
+                self.respawning_ghosts.append(ghost)
+                self.scheduler.schedule(seconds_to_ticks(GHOST_RESPAWN_DELAY), self.respawn_ghost, ghost)
+
+    def respawn_ghost(self, ghost):
+        self.respawning_ghosts.remove(ghost)
+        ghost.respawn()
+
+    # Everything that changes during a game, to go back to later with restore_snapshot()
+    # Snapshots are only restored into the simulation they were taken from, and aren't added to the recording
+    def get_snapshot(self):
+        if (self.fright_flash is not None):
+            fright_flash = self.fright_flash[1]
+        else:
+            fright_flash = None
+
+        return (self.tick, self.score, self.level, self.game_over, self.active_power_pellets, self.flashing,
+            tuple(self.respawning_ghosts), fright_flash, self.scheduler.get_snapshot(), 
+            self.pac_man.get_snapshot(), tuple(ghost.get_snapshot() for ghost in self.ghosts), 
+            self.pellets.get_snapshot())
+
+    def restore_snapshot(self, snapshot):
+        (self.tick, self.score, self.level, self.game_over, self.active_power_pellets, self.flashing,
+            respawning_ghosts, fright_flash, scheduler_snapshot, pac_man_snapshot, ghost_snapshots,
+            pellets_snapshot) = snapshot
+
+        self.respawning_ghosts = list(respawning_ghosts)
+        self.scheduler.restore_snapshot(scheduler_snapshot)
+        if (fright_flash is not None):
+            self.fright_flash = self.scheduler.find_entry(fright_flash)
+        else:
+            self.fright_flash = None
+
+        self.pac_man.restore_snapshot(pac_man_snapshot)
+        for ghost, ghost_snapshot in zip(self.ghosts, ghost_snapshots):
+            ghost.restore_snapshot(ghost_snapshot)
+        self.ghost_grid_tick = None
+        self.pellets.restore_snapshot(pellets_snapshot)
+
+def seconds_to_ticks(seconds):
+    return round(seconds * TICKS_PER_SECOND)
@@ -5,3 +5,4 @@ class UserEvents:
     ATE_SUPER_PELLET = pygame.USEREVENT + 2
     ATE_GHOST = pygame.USEREVENT + 3
     GAME_OVER = pygame.USEREVENT + 4
+    LEVEL_CLEARED = pygame.USEREVENT + 5